@@ -0,0 +1,121 @@
+from agent.basic_agent import Agent
+from game.go import opponent_color
+from game.bitboard import BitBoard
+from game.playout import playout
+from math import log, sqrt
+import random
+import time
+"""
+Monte Carlo tree search agent (UCT).
+"""
+
+
+class Node:
+    def __init__(self, board, parent=None, action=None):
+        """
+        :param board: the board of this node, only used to initialize the node
+        :param parent:
+        :param action: the action leading from parent to this node
+        """
+        self.parent = parent
+        self.action = action
+        self.key = board.zobrist_key
+        self.player = opponent_color(board.next)  # The player that played self.action
+        self.children = {}  # {action: node}
+        self.untried_actions = list(board.get_legal_actions()) if board.winner is None else []
+        random.shuffle(self.untried_actions)
+        self.visits = 0
+        self.wins = 0.0  # Wins of self.player
+
+    def select_child(self, c):
+        """Return the child with the highest UCB1 score."""
+        log_visits = log(self.visits)
+        return max(self.children.values(),
+                   key=lambda child: child.wins / child.visits + c * sqrt(log_visits / child.visits))
+
+
+class MCTSAgent(Agent):
+    """
+    UCT with random playouts (see game.playout); the tree is walked with play()/undo() on a BitBoard of the position,
+    converted once per get_action(), so that playouts only copy it.
+    The subtree of the actual position is reused across get_action() calls.
+    """
+    def __init__(self, color, num_playouts=1000, move_time=None, c=sqrt(2)):
+        """
+        :param color:
+        :param num_playouts: number of playouts per move, if move_time is None
+        :param move_time: if not None, time budget in seconds per move instead of num_playouts
+        :param c: exploration constant of UCB1
+        """
+        super().__init__(color)
+        self.num_playouts = num_playouts
+        self.move_time = move_time
+        self.c = c
+        self.root = None
+
+    def get_action(self, board):
+        actions = board.get_legal_actions()
+        if len(actions) <= 1:
+            return actions[0] if actions else None
+
+        if not isinstance(board, BitBoard):
+            board = BitBoard.from_compact(board.to_compact())
+        self.root = self._find_root(board)
+        start_time = time.time()
+        num_playouts = 0
+        while True:
+            self._run_playout(self.root, board)
+            num_playouts += 1
+            if self.move_time is not None:
+                if time.time() - start_time >= self.move_time:
+                    break
+            elif num_playouts >= self.num_playouts:
+                break
+
+        return max(self.root.children.values(), key=lambda child: child.visits).action
+
+    def _find_root(self, board):
+        """Reuse the node of the board from the previous tree (up to two moves down), or create a new root."""
+        if self.root is not None:
+            for child in self.root.children.values():
+                for node in [child] + list(child.children.values()):
+                    if node.key == board.zobrist_key:
+                        node.parent = None
+                        return node
+        return Node(board)
+
+    def _run_playout(self, root, board):
+        """Select and expand a node, play randomly to the end, and back-propagate the result."""
+        num_moves = len(board.undo_stack)
+        node = root
+
+        # Selection
+        while not node.untried_actions and node.children:
+            node = node.select_child(self.c)
+            board.play(node.action)
+
+        # Expansion
+        if node.untried_actions:
+            action = node.untried_actions.pop()
+            board.play(action)
+            child = Node(board, parent=node, action=action)
+            node.children[action] = child
+            node = child
+
+        # Playout
+        winner, _ = playout(board)
+
+        while len(board.undo_stack) > num_moves:
+            board.undo()
+
+        # Back-propagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            node = node.parent
+
+    def __str__(self):
+        if self.move_time is not None:
+            return '%s; color: %s; move_time: %s' % (self.__class__.__name__, self.color, self.move_time)
+        return '%s; color: %s; num_playouts: %d' % (self.__class__.__name__, self.color, self.num_playouts)
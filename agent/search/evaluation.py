@@ -1,13 +1,18 @@
 from game.go import Board, opponent_color
-from agent.util import get_num_endangered_groups, get_liberties, is_dangerous_liberty, get_num_groups_with_k_liberties
 from numpy.random import normal
 """
 Evaluation functions for search_agent.
 """
 
+SCORE_BOUNDS = (-1000, 1000)  # All scores of evaluate() are within these bounds (a win scores 1000 - counter_move)
+
 
 def evaluate(board: Board, color):
-    """Color has the next action"""
+    """
+    Color has the next action.
+    Uses the aggregates maintained by the board (num_groups_by_liberty, liberty_sum, num_liberty_points,
+    dangerous_liberties) instead of scanning all groups and liberties.
+    """
     # Score for win or lose
     score_win = 1000 - board.counter_move  # Prefer faster game
     if board.winner:
@@ -15,40 +20,35 @@ def evaluate(board: Board, color):
 
     oppo = opponent_color(color)
     # Score for endangered groups
-    num_endangered_self, num_endangered_oppo = get_num_endangered_groups(board, color)
+    num_endangered_self = board.num_groups_by_liberty[color].get(1, 0)
+    num_endangered_oppo = board.num_groups_by_liberty[oppo].get(1, 0)
     if num_endangered_oppo > 0:
         return score_win - 10  # Win in the next move
     elif num_endangered_self > 1:
         return -(score_win - 10)  # Lose in the next move
 
     # Score for dangerous liberties
-    liberties_self, liberties_oppo = get_liberties(board, color)
-    for liberty in liberties_oppo:
-        if is_dangerous_liberty(board, liberty, oppo):
-            return score_win / 2  # Good probability to win in the next next move
-    for liberty in liberties_self:
-        if is_dangerous_liberty(board, liberty, color):
-            self_groups = board.libertydict.get_groups(color, liberty)
-            liberties = self_groups[0].liberties | self_groups[1].liberties
-            able_to_save = False
-            for lbt in liberties:
-                if len(board.libertydict.get_groups(oppo, lbt)) > 0:
-                    able_to_save = True
-                    break
-            if not able_to_save:
-                return -score_win / 2  # Good probability to lose in the next next move
+    if board.dangerous_liberties[oppo]:
+        return score_win / 2  # Good probability to win in the next next move
+    for liberty in board.dangerous_liberties[color]:
+        self_groups = board.libertydict.get_groups(color, liberty)
+        liberties = self_groups[0].liberties | self_groups[1].liberties
+        able_to_save = False
+        for lbt in liberties:
+            if len(board.libertydict.get_groups(oppo, lbt)) > 0:
+                able_to_save = True
+                break
+        if not able_to_save:
+            return -score_win / 2  # Good probability to lose in the next next move
 
     # Score for groups
-    num_groups_2lbt_self, num_groups_2lbt_oppo = get_num_groups_with_k_liberties(board, color, 2)
+    num_groups_2lbt_self = board.num_groups_by_liberty[color].get(2, 0)
+    num_groups_2lbt_oppo = board.num_groups_by_liberty[oppo].get(2, 0)
     score_groups = num_groups_2lbt_oppo - num_groups_2lbt_self
 
-    # Score for liberties
-    num_shared_liberties_self = 0
-    num_shared_liberties_oppo = 0
-    for liberty in liberties_self:
-        num_shared_liberties_self += len(board.libertydict.get_groups(color, liberty)) - 1
-    for liberty in liberties_oppo:
-        num_shared_liberties_oppo += len(board.libertydict.get_groups(oppo, liberty)) - 1
+    # Score for liberties: each liberty shared by n groups counts n - 1 times
+    num_shared_liberties_self = board.liberty_sum[color] - board.num_liberty_points[color]
+    num_shared_liberties_oppo = board.liberty_sum[oppo] - board.num_liberty_points[oppo]
     score_liberties = num_shared_liberties_oppo - num_shared_liberties_self
 
     # Score for groups (doesn't help)
@@ -0,0 +1,74 @@
+from game.go import opponent_color, ZOBRIST_STONE
+"""
+Move ordering for search_agent: tactical moves first, then killer moves, then history heuristic.
+"""
+
+CAPTURE = 2  # The action removes an opponent's group
+ATARI = 1  # The action leaves an opponent's group with only one liberty
+
+
+def tactical_score(board, action):
+    """Return CAPTURE, ATARI or 0 for the action of board.next."""
+    score = 0
+    for group in board.libertydict.get_groups(opponent_color(board.next), action):
+        num_liberty = group.num_liberty
+        if num_liberty == 1:
+            return CAPTURE
+        elif num_liberty == 2:
+            score = ATARI
+    return score
+
+
+def is_forced(board):
+    """Return True if board.next only has forced actions: capturing an endangered group, or else saving one."""
+    return len(board.endangered_groups) > 0
+
+
+class MoveOrderer:
+    """
+    Order actions by: captures and ataris (derived from libertydict), killer moves of the ply, history heuristic.
+    Killer moves are reset for each search; history scores persist across searches and are halved each time.
+    """
+    def __init__(self, num_killers=2):
+        self.num_killers = num_killers
+        self.killers = {}  # {ply: [actions]}
+        self.history = {'BLACK': {}, 'WHITE': {}}  # {color: {action: score}}
+
+    def new_search(self):
+        self.killers = {}
+        for color in self.history:
+            self.history[color] = {action: score // 2 for action, score in self.history[color].items() if score > 1}
+
+    def record_cutoff(self, color, action, ply, remaining):
+        """
+        Record an action that caused a cutoff (or was the best) at this ply.
+        :param color: the color that played the action
+        :param remaining: remaining plies below the node; deeper cutoffs weigh more
+        """
+        killers = self.killers.setdefault(ply, [])
+        if action not in killers:
+            killers.insert(0, action)
+            del killers[self.num_killers:]
+        history = self.history[color]
+        history[action] = history.get(action, 0) + remaining * remaining
+
+    def order(self, board, legal_actions, ply, first_actions=(), limit=None):
+        """
+        Return the legal actions in search order, cut to the first `limit` actions if given.
+        Ties are broken by the (seeded random) Zobrist key of the stone, so the order does not depend on the order of
+        legal_actions, and ties cut by `limit` are not biased to any side of the board.
+        :param first_actions: actions searched before all others if legal, such as PV or transposition table moves
+        """
+        killers = self.killers.get(ply, ())
+        history = self.history[board.next]
+        tie_keys = ZOBRIST_STONE[board.next]
+        ordered = sorted(legal_actions, reverse=True,
+                         key=lambda action: (tactical_score(board, action), action in killers, history.get(action, 0),
+                                             tie_keys[action]))
+
+        first_actions = [action for action in first_actions if action is not None and action in legal_actions]
+        if first_actions:
+            ordered = list(dict.fromkeys(first_actions)) + [action for action in ordered if action not in first_actions]
+        if limit:
+            ordered = ordered[:limit]
+        return ordered
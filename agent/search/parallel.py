@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from agent.search.stats import SearchStats
+from argparse import ArgumentParser
+"""
+Root-parallel search for search_agent: the root actions are split across a persistent pool of worker processes.
+Run with `python -m agent.search.parallel` to check that the parallel and the serial search return the same scores.
+"""
+
+_shared_alpha = None  # Best root score found so far, shared by all workers of the pool
+_agents = {}  # Agents of this worker process, kept across moves (transposition table, history heuristic)
+
+
+def _init_worker(shared_alpha):
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def _search_root_actions(agent_spec, board_cls, compact_board, actions, depth, pruning_actions, deadline):
+    """
+    Worker: search the subtrees of the given root actions.
+    :param agent_spec: SearchAgent.worker_spec(), the class, color and constructor options of the agent
+    :return: list of (action, score, subsequent actions), and the search stats as a dict
+    """
+    agent = _agents.get(agent_spec)
+    if agent is None:
+        agent_cls, color, options = agent_spec
+        agent = agent_cls(color, depth, **dict(options))
+        _agents[agent_spec] = agent
+    agent.depth = depth
+    agent.pruning_actions = pruning_actions
+    agent.deadline = deadline
+    agent.new_search()
+    agent.stats = SearchStats()
+
+    board = board_cls.from_compact(compact_board)
+    ext = agent.child_extension(board, 0)
+    results = []
+    for action in actions:
+        agent.play(board, action)
+        score, subsequent_actions = agent.root_child_value(board, _shared_alpha.value, ext)
+        agent.undo(board)
+        results.append((action, score, subsequent_actions))
+        with _shared_alpha.get_lock():
+            if score > _shared_alpha.value:
+                _shared_alpha.value = score
+    return results, agent.stats.to_dict()
+
+
+class RootParallel:
+    """Persistent worker pool splitting the root actions of a search agent; created lazily on first use."""
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.shared_alpha = multiprocessing.Value('d', float('-inf'))
+        self.executor = None
+
+    def search(self, agent, board, actions):
+        """
+        Search the root actions of the board in parallel, with the agent's current depth and deadline;
+        the stats of the workers are added to agent.stats.
+        :return: list of (action, score, subsequent actions), in the order of actions
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.num_workers, initializer=_init_worker,
+                                                initargs=(self.shared_alpha,))
+        self.shared_alpha.value = float('-inf')
+
+        agent_spec = agent.worker_spec()
+        compact_board = board.to_compact()
+        # Round-robin so that every worker gets some of the best ordered actions
+        chunks = [actions[i::self.num_workers] for i in range(self.num_workers) if actions[i::self.num_workers]]
+        futures = [self.executor.submit(_search_root_actions, agent_spec, board.__class__, compact_board, chunk,
+                                        agent.depth, agent.pruning_actions, agent.deadline) for chunk in chunks]
+        results = {}
+        for future in futures:
+            worker_results, stats = future.result()  # Re-raises SearchTimeout of workers
+            for action, score, subsequent_actions in worker_results:
+                results[action] = (action, score, subsequent_actions)
+            agent.stats.merge(stats)
+        return [results[action] for action in actions]
+
+    def __getstate__(self):
+        """Agents may be pickled (e.g. to benchmark processes); the pool is not, and is re-created lazily."""
+        return {'num_workers': self.num_workers}
+
+    def __setstate__(self, state):
+        self.__init__(state['num_workers'])
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def check(agent_cls, depth, num_positions=10, num_workers=2, seed=0, **options):
+    """
+    Search seeded positions with the serial agent and with RootParallel, full-width and with an evaluation
+    seeded by the position, so that both search the same tree.
+    :return: list of (serial score, parallel score) of the positions
+    """
+    from agent.search.pruning_benchmark import positions, position_evaluate
+    serial = agent_cls('BLACK', depth, eval_func=position_evaluate, **options)
+    parallel = agent_cls('BLACK', depth, eval_func=position_evaluate, num_workers=num_workers, **options)
+    scores = []
+    try:
+        for board in positions(num_positions, seed):
+            serial.color = parallel.color = board.next
+            serial.get_action(board, pruning_actions=None)
+            parallel.get_action(board, pruning_actions=None)
+            scores.append((serial.stats.score, parallel.stats.score))
+    finally:
+        parallel.close()
+    return scores
+
+
+def main():
+    from agent.search.search_agent import AlphaBetaAgent, ExpectimaxAgent
+    parser = ArgumentParser('Root-Parallel Search Check')
+    parser.add_argument('-d', '--depths', type=int, nargs='+', default=[1, 2],
+                        help='search depths; DEFAULT is 1 2')
+    parser.add_argument('-n', '--num_positions', type=int, default=10,
+                        help='number of positions; DEFAULT is 10')
+    parser.add_argument('-p', '--num_workers', type=int, default=2,
+                        help='number of worker processes; DEFAULT is 2')
+    args = parser.parse_args()
+
+    num_mismatches = 0
+    for agent_cls in (AlphaBetaAgent, ExpectimaxAgent):
+        for depth in args.depths:
+            scores = check(agent_cls, depth, args.num_positions, args.num_workers)
+            mismatches = [(serial, parallel) for serial, parallel in scores if serial != parallel]
+            num_mismatches += len(mismatches)
+            print('%s depth %d: %d/%d same root scores %s' % (agent_cls.__name__, depth, len(scores) - len(mismatches),
+                                                              len(scores), mismatches if mismatches else ''))
+    if num_mismatches:
+        raise SystemExit('%d mismatches' % num_mismatches)
+
+
+if __name__ == '__main__':
+    main()
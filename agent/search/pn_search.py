@@ -0,0 +1,174 @@
+from agent.search.move_ordering import tactical_score, CAPTURE, ATARI
+from argparse import ArgumentParser
+import time
+"""
+Proof-number solver of forced captures, for analysis and as a pre-search check of search_agent.
+The attacker only plays captures and ataris, so every reply of the defender is forced (capturing or saving a group)
+and the proof trees stay narrow; proven means the attacker wins by a forced sequence, disproven means that no such
+sequence exists (the attacker may still win by quiet moves).
+The search is depth-first proof-number search (df-pn) in negamax form: each position keeps (phi, delta), the proof
+and disproof numbers for the side to move, in a memo table keyed by Board.zobrist_key.
+Run with `python -m agent.search.pn_search` to solve positions of seeded random games.
+"""
+
+INF = 10 ** 9  # Proof or disproof number of a solved position
+
+UNKNOWN = 0  # Node budget used up before the position is solved
+PROVEN = 1  # The attacker wins by a forced sequence of captures and ataris
+DISPROVEN = 2  # The attacker has no such forced win
+
+
+class NodeBudgetExceeded(Exception):
+    """Raised inside the solver when max_nodes positions are expanded."""
+    pass
+
+
+class PNSolver:
+    """
+    df-pn solver with a node budget per solve() call. The memo tables (one per attacker) are kept across calls,
+    so that proofs and estimates are reused along a game; they are cleared when holding over max_entries positions.
+    """
+    def __init__(self, max_nodes=10000, max_entries=2 ** 18):
+        """
+        :param max_nodes: most positions expanded by one solve() call
+        :param max_entries: memory cap of each memo table in number of positions
+        """
+        self.max_nodes = max_nodes
+        self.max_entries = max_entries
+        self.tables = {'BLACK': {}, 'WHITE': {}}  # {attacker: {zobrist_key: (phi, delta)}}
+        self.table = None  # Table of the attacker of the current solve()
+        self.attacker = None
+        self.nodes = 0  # Positions expanded by the last solve()
+
+    def solve(self, board, attacker=None, max_nodes=None):
+        """
+        Try to prove that the attacker wins by a forced sequence of captures and ataris; board is left unchanged.
+        :param attacker: BLACK or WHITE; DEFAULT is board.next
+        :param max_nodes: if not None, the node budget instead of self.max_nodes
+        :return: PROVEN, DISPROVEN or UNKNOWN, and the winning action if proven with the attacker to move, else None
+        """
+        self.attacker = attacker or board.next
+        self.table = self.tables[self.attacker]
+        if len(self.table) > self.max_entries:
+            self.table.clear()
+        self.nodes = 0
+        max_nodes = self.max_nodes if max_nodes is None else max_nodes
+
+        key = board.zobrist_key
+        if key not in self.table:
+            self.table[key] = self._initial_numbers(board)
+        num_moves = len(board.undo_stack)
+        try:
+            self._mid(board, INF, INF, max_nodes)
+        except NodeBudgetExceeded:
+            while len(board.undo_stack) > num_moves:  # Unwind the interrupted search
+                board.undo()
+            return UNKNOWN, None
+
+        phi, delta = self.table[key]
+        if (phi == 0) != (board.next == self.attacker):
+            return DISPROVEN, None
+        return PROVEN, self._winning_action(board) if board.next == self.attacker else None
+
+    def _actions(self, board):
+        """Actions searched for board.next: all legal actions of the defender; captures and ataris of the attacker."""
+        legal_actions = board.get_legal_actions()
+        if board.next != self.attacker:
+            return legal_actions
+        return [action for action in legal_actions if tactical_score(board, action) >= ATARI]
+
+    def _initial_numbers(self, board):
+        """(phi, delta) of a position not searched yet: solved if the game is decided here, else (1, 1)."""
+        if board.winner is not None:
+            return (0, INF) if board.winner == board.next else (INF, 0)
+        legal_actions = board.get_legal_actions()
+        if tactical_score(board, legal_actions[0]) == CAPTURE:
+            return 0, INF  # The side to move wins by capturing
+        if board.next == self.attacker and not any(tactical_score(board, action) >= ATARI for action in legal_actions):
+            return INF, 0  # No forcing action left for the attacker
+        return 1, 1
+
+    def _mid(self, board, threshold_phi, threshold_delta, max_nodes):
+        """Search the position until its phi or delta reaches the threshold; the numbers are stored in self.table."""
+        self.nodes += 1
+        if self.nodes > max_nodes:
+            raise NodeBudgetExceeded()
+        table = self.table
+        key = board.zobrist_key
+        phi, delta = table[key]
+        if phi >= threshold_phi or delta >= threshold_delta:
+            return
+
+        children = []  # (action, zobrist_key) of the children
+        for action in self._actions(board):
+            board.play(action)
+            child_key = board.zobrist_key
+            if child_key not in table:
+                table[child_key] = self._initial_numbers(board)
+            board.undo()
+            children.append((action, child_key))
+
+        while True:
+            # phi is the lowest delta of the children, delta the sum of their phi
+            delta = 0
+            best_child = None
+            delta_best = delta_second = INF
+            for child in children:
+                child_phi, child_delta = table[child[1]]
+                delta = min(delta + child_phi, INF)
+                if child_delta < delta_best:
+                    best_child, delta_second, delta_best = child, delta_best, child_delta
+                elif child_delta < delta_second:
+                    delta_second = child_delta
+            phi = delta_best
+            table[key] = (phi, delta)
+            if phi >= threshold_phi or delta >= threshold_delta:
+                return
+
+            action, child_key = best_child
+            child_phi = table[child_key][0]
+            board.play(action)
+            self._mid(board, threshold_delta + child_phi - delta, min(threshold_phi, delta_second + 1), max_nodes)
+            board.undo()
+
+    def _winning_action(self, board):
+        """The action of a proven position (attacker to move) that leads to a disproven position of the defender."""
+        for action in self._actions(board):
+            board.play(action)
+            entry = self.table.get(board.zobrist_key)
+            board.undo()
+            if entry is not None and entry[1] == 0:
+                return action
+        return None
+
+
+def solve(board, attacker=None, max_nodes=10000):
+    """Solve the board with a new PNSolver; return (PROVEN/DISPROVEN/UNKNOWN, winning action or None) as solve()."""
+    return PNSolver(max_nodes).solve(board, attacker)
+
+
+def main():
+    from agent.search.pruning_benchmark import positions
+    parser = ArgumentParser('Proof-Number Solver')
+    parser.add_argument('-n', '--num_positions', type=int, default=100,
+                        help='number of positions; DEFAULT is 100')
+    parser.add_argument('-m', '--max_nodes', type=int, default=10000,
+                        help='node budget per position; DEFAULT is 10000')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the positions; DEFAULT is 0')
+    args = parser.parse_args()
+
+    solver = PNSolver(args.max_nodes)
+    counts = {PROVEN: 0, DISPROVEN: 0, UNKNOWN: 0}
+    total_nodes = 0
+    start_time = time.time()
+    for board in positions(args.num_positions, args.seed):
+        result, _ = solver.solve(board)
+        counts[result] += 1
+        total_nodes += solver.nodes
+    print('%d positions: proven %d; disproven %d; unknown %d; nodes %d; %.2fs' % (
+        args.num_positions, counts[PROVEN], counts[DISPROVEN], counts[UNKNOWN], total_nodes, time.time() - start_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+from game.go import Board
+from agent.search.search_agent import ExpectimaxAgent
+from agent.search.evaluation import evaluate
+from game.symmetry import canonical_key
+from argparse import ArgumentParser
+import random
+import time
+import numpy as np
+"""
+Benchmark of the chance node pruning of ExpectimaxAgent (Star1): nodes searched at each depth without pruning and
+with Star1, and whether the moves are the same, on positions of seeded random games.
+Run with `python -m agent.search.pruning_benchmark`.
+"""
+
+CONFIGS = (('none', {'eval_bounds': None}), ('star1', {}))
+
+
+def position_evaluate(board, color):
+    """
+    evaluate() with its noise drawn from a seed of the position, so that all searches score a position the same;
+    the seed is the canonical key, so that all orientations also score the same (for symmetric transposition tables).
+    """
+    np.random.seed(canonical_key(board) % 2 ** 32)
+    return evaluate(board, color)
+
+
+def positions(num_positions, seed=0, min_actions=3):
+    """Non-terminal positions of seeded random games with at least min_actions legal actions."""
+    rng = random.Random(seed)
+    result = []
+    while len(result) < num_positions:
+        board = Board(next_color='BLACK')
+        board.put_stone(board.center, check_legal=False)
+        while board.winner is None and len(result) < num_positions:
+            if len(board.get_legal_actions()) >= min_actions and rng.random() < 0.3:
+                result.append(board.copy())
+            board.put_stone(rng.choice(sorted(board.get_legal_actions())), check_legal=False)
+    return result
+
+
+def run(boards, depth):
+    """
+    Search every board with every config of CONFIGS.
+    :return: {config name: (total nodes, total leaf evaluations, seconds)}, and the number of boards where
+             all configs chose the same action
+    """
+    totals = {name: [0, 0, 0.0] for name, _ in CONFIGS}
+    num_same = 0
+    for board in boards:
+        actions = set()
+        for name, kwargs in CONFIGS:
+            agent = ExpectimaxAgent(board.next, depth, eval_func=position_evaluate, **kwargs)
+            start_time = time.time()
+            actions.add(agent.get_action(board))
+            totals[name][0] += agent.stats.nodes
+            totals[name][1] += agent.stats.leaf_evals
+            totals[name][2] += time.time() - start_time
+        num_same += len(actions) == 1
+    return {name: tuple(total) for name, total in totals.items()}, num_same
+
+
+def main():
+    parser = ArgumentParser('Expectimax Pruning Benchmark')
+    parser.add_argument('-d', '--depths', type=int, nargs='+', default=[1, 2, 3],
+                        help='search depths; DEFAULT is 1 2 3')
+    parser.add_argument('-n', '--num_positions', type=int, default=20,
+                        help='number of positions; DEFAULT is 20')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of the positions; DEFAULT is 0')
+    args = parser.parse_args()
+
+    boards = positions(args.num_positions, args.seed)
+    print('%d positions' % len(boards))
+    for depth in args.depths:
+        totals, num_same = run(boards, depth)
+        nodes_none = totals['none'][0]
+        print('depth %d: same moves %d/%d' % (depth, num_same, len(boards)))
+        for name, (nodes, leaf_evals, seconds) in totals.items():
+            print('  %-6s nodes %9d (%5.1f%% saved); evals %9d; %.2fs' % (
+                name, nodes, 100 * (1 - nodes / nodes_none) if nodes_none else 0, leaf_evals, seconds))
+
+
+if __name__ == '__main__':
+    main()
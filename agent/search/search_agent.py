@@ -1,132 +1,476 @@
 from agent.basic_agent import Agent
-import random
-from agent.search.evaluation import evaluate
+import time
+from agent.search.evaluation import evaluate, SCORE_BOUNDS
+from agent.search.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from agent.search.move_ordering import MoveOrderer, tactical_score, is_forced, CAPTURE
+from agent.search.parallel import RootParallel
+from agent.search.stats import SearchStats
+from agent.search.pn_search import PNSolver, PROVEN
+
+
+MAX_ITERATIVE_DEPTH = 20  # Deepest iteration of the anytime mode
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget of the move is used up."""
+    pass
 
 
 class SearchAgent(Agent):
-    def __init__(self, color, depth, eval_func):
+    def __init__(self, color, depth, eval_func, move_time=None, num_workers=None, solver_nodes=None):
         """
         :param color:
         :param depth: search depth
         :param eval_func: evaluation function from the evaluation module
+        :param move_time: if not None, time budget in seconds per move; search iteratively with depth 1, 2, 3...
+        and use the best action of the last completed iteration instead of the fixed depth
+        :param num_workers: if not None, split the root actions across this number of worker processes
+        :param solver_nodes: if not None, node budget of the proof-number solver (see pn_search) tried before each
+        search; a proven forced win is played without searching
         """
         super().__init__(color)
         self.depth = depth
         self.eval_func = eval_func
         self.pruning_actions = None
+        self.move_orderer = MoveOrderer()
+        self.move_time = move_time
+        self.start_time = None
+        self.deadline = None  # Only set while searching in anytime mode
+        self.parallel = RootParallel(num_workers) if num_workers else None
+        self.solver = PNSolver(solver_nodes) if solver_nodes else None
+        self.stats = SearchStats()  # Stats of the last search
+        # Constructor options rebuilding the same agent in worker processes; subclasses add their own options
+        self.worker_options = {'eval_func': eval_func, 'solver_nodes': solver_nodes}
 
     def get_action(self, board):
         raise NotImplementedError
 
+    def new_search(self):
+        """Reset the state kept for one search, such as killer moves."""
+        self.move_orderer.new_search()
+
+    def search_root(self, board, pv):
+        """Search from the root to self.depth; return the score and the corresponding actions."""
+        raise NotImplementedError
+
+    def root_child_value(self, board, alpha, ext=0):
+        """
+        Return the score and subsequent actions of a root child (after the root action is played).
+        :param ext: search extension of the root children, see child_extension()
+        """
+        raise NotImplementedError
+
+    def child_extension(self, board, ext):
+        """Return the search extension of the children of a node with extension ext; no extensions by default."""
+        return ext
+
+    def worker_spec(self):
+        """Return (class, color, options) to build the same agent in worker processes (see RootParallel)."""
+        return self.__class__, self.color, tuple(sorted(self.worker_options.items()))
+
+    def parallel_root(self, board, first_actions):
+        """Search the root actions with the worker pool; return the highest score and the corresponding actions."""
+        max_score = float("-inf")
+        max_score_actions = None
+        legal_actions = self.prune_actions(board, 0, first_actions)
+        for action, score, actions in self.parallel.search(self, board, legal_actions):
+            if score > max_score:
+                max_score = score
+                max_score_actions = [action] + actions
+        return max_score, max_score_actions
+
+    def close(self):
+        """Shut down the worker processes, if any."""
+        if self.parallel is not None:
+            self.parallel.close()
+
+    def search(self, board, search_root):
+        """
+        Search the board to self.depth, or iteratively deepen within self.move_time; record self.stats.
+        :param board:
+        :param search_root: function(board, pv) -> (score, actions), searching from the root to self.depth;
+        pv is the principal variation of the previous iteration (searched first), or None
+        :return: score and actions of the (last completed) search
+        """
+        self.stats = SearchStats()
+        self.start_time = time.time()
+        result, depth = self._solve(board)
+        if result is None:
+            result, depth = self._search(board, search_root)
+        self.stats.time_elapsed = time.time() - self.start_time
+        self.stats.depth = depth
+        self.stats.score, self.stats.pv = result
+        return result
+
+    def _solve(self, board):
+        """Return the result of search() and depth 0 if the solver proves a forced win, else (None, None)."""
+        if self.solver is None:
+            return None, None
+        result, action = self.solver.solve(board, self.color)
+        self.stats.solver_nodes = self.solver.nodes
+        if result != PROVEN or action is None:
+            return None, None
+        return (None, [action]), 0
+
+    def _search(self, board, search_root):
+        """Return the result of search() and the depth of the last completed search."""
+        if self.move_time is None:
+            return search_root(board, None), self.depth
+
+        legal_actions = board.get_legal_actions()
+        if len(legal_actions) == 1:
+            return (None, legal_actions), 0
+
+        max_depth = self.depth
+        num_moves = len(board.undo_stack)
+        result = None
+        completed_depth = 0
+        try:
+            for depth in range(1, MAX_ITERATIVE_DEPTH + 1):
+                self.depth = depth
+                # The first iteration always completes, so that there is an action to return
+                self.deadline = self.start_time + self.move_time if result else None
+                result = search_root(board, result[1] if result else None)
+                completed_depth = depth
+                if time.time() - self.start_time >= self.move_time:
+                    break
+        except SearchTimeout:
+            while len(board.undo_stack) > num_moves:  # Unwind the interrupted iteration
+                self.undo(board)
+        finally:
+            self.depth = max_depth
+            self.deadline = None
+        return result, completed_depth
+
+    def check_time(self):
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout()
+
+    def prune_actions(self, board, ply, first_actions=()):
+        """
+        Order the legal actions (see MoveOrderer) and keep the first self.pruning_actions of them.
+        :param ply: number of plies from the root
+        :param first_actions: such as the principal variation or the best action from transposition table
+        """
+        start_time = time.perf_counter()
+        actions = self.move_orderer.order(board, board.get_legal_actions(), ply, first_actions, self.pruning_actions)
+        self.stats.ordering_time += time.perf_counter() - start_time
+        return actions
+
+    def evaluate(self, board, color=None):
+        """Score the board with eval_func for color (DEFAULT is self.color); counted in self.stats."""
+        start_time = time.perf_counter()
+        score = self.eval_func(board, color or self.color)
+        self.stats.eval_time += time.perf_counter() - start_time
+        self.stats.leaf_evals += 1
+        return score
+
+    def play(self, board, action):
+        """Apply the action in place (see Board.play()); counted in self.stats."""
+        start_time = time.perf_counter()
+        board.play(action)
+        self.stats.move_time += time.perf_counter() - start_time
+        self.stats.nodes += 1
+
+    def undo(self, board):
+        start_time = time.perf_counter()
+        board.undo()
+        self.stats.move_time += time.perf_counter() - start_time
+
     def __str__(self):
+        if self.move_time is not None:
+            return '%s; color: %s; move_time: %s' % (self.__class__.__name__, self.color, self.move_time)
         return '%s; color: %s; search_depth: %d' % (self.__class__.__name__, self.color, self.depth)
 
 
 class AlphaBetaAgent(SearchAgent):
-    def __init__(self, color, depth, eval_func=evaluate):
-        super().__init__(color, depth, eval_func)
+    """
+    Forced plies (capturing or saving an endangered group, see is_forced()) don't consume the search depth,
+    up to max_extensions plies on each path, so ataris and ladders are read further than the nominal depth.
+    At the horizon, a capture-only quiescence search settles the captures before evaluating.
+    """
+    def __init__(self, color, depth, eval_func=evaluate, tt_size=2 ** 16, move_time=None, num_workers=None,
+                 symmetric_tt=False, max_extensions=1, quiescence=True, solver_nodes=None):
+        """
+        :param tt_size: number of entries of the transposition table, kept across get_action(); 0 to disable
+        :param symmetric_tt: if True, the transposition table shares entries among symmetric positions;
+        only sound if eval_func scores all orientations of a position the same,
+        e.g. with noise seeded by canonical_key()
+        :param max_extensions: most forced plies searched beyond the depth on a path; 0 to disable
+        :param quiescence: if True, settle captures at the horizon with quiescence_value() before evaluating
+        """
+        super().__init__(color, depth, eval_func, move_time=move_time, num_workers=num_workers,
+                         solver_nodes=solver_nodes)
+        self.tt = TranspositionTable(tt_size, symmetric_tt) if tt_size else None
+        self.max_extensions = max_extensions
+        self.quiescence = quiescence
+        self.worker_options.update(tt_size=tt_size, symmetric_tt=symmetric_tt, max_extensions=max_extensions,
+                                   quiescence=quiescence)
+
+    def evaluate(self, board, color=None):
+        """
+        Score the board for self.color. Extended and quiescence paths can reach the horizon on the opponent's turn;
+        eval_func scores for the color that has the next action, so there the opponent's score is negated.
+        """
+        if board.next == self.color or self.terminal_test(board):
+            return super().evaluate(board)
+        return -super().evaluate(board, board.next)
 
     def get_action(self, board, pruning_actions=20):
 
         self.pruning_actions = pruning_actions
-        score, actions = self.max_value(board, 0, float("-inf"), float("inf"))
+        self.new_search()
+        score, actions = self.search(board, self.search_root)
 
         return actions[0] if len(actions) > 0 else None
 
-    def max_value(self, board, depth, alpha, beta):
-        """Return the highest score and the corresponding subsequent actions"""
-        if self.terminal_test(board) or depth == self.depth:
-            return self.eval_func(board, self.color), []
+    def new_search(self):
+        super().new_search()
+        if self.tt is not None:
+            self.tt.new_search()
+
+    def search_root(self, board, pv):
+        if self.parallel is None:
+            return self.max_value(board, 0, float("-inf"), float("inf"), pv)
+        entry = self.tt.probe_board(board) if self.tt is not None else None
+        return self.parallel_root(board, [pv[0] if pv else None, entry[4] if entry else None])
+
+    def root_child_value(self, board, alpha, ext=0):
+        return self.min_value(board, 0, alpha, float("inf"), None, ext)
+
+    def child_extension(self, board, ext):
+        """One more forced ply for the children if the side to move only has forced actions (see is_forced())."""
+        return ext + 1 if ext < self.max_extensions and is_forced(board) else ext
+
+    def _probe(self, board, remaining, alpha, beta):
+        """Return (score, actions) if the transposition table settles this node, else (None, best_action)."""
+        entry = self.tt.probe_board(board)
+        if entry is None:
+            return None, None
+        _, entry_depth, score, flag, best_action, _ = entry
+        if entry_depth >= remaining:
+            if flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha):
+                return (score, [best_action] if best_action else []), best_action
+        return None, best_action
+
+    def max_value(self, board, depth, alpha, beta, pv=None, ext=0):
+        """
+        Return the highest score and the corresponding subsequent actions
+        :param pv: principal variation from this node of the previous search, searched first
+        :param ext: number of forced plies on the path to this node, which extend the search
+        """
+        if self.terminal_test(board):
+            return self.evaluate(board), []
+        remaining = 2 * self.depth + ext - 2 * depth  # Remaining plies
+        if remaining <= 0:
+            return (self.quiescence_value(board) if self.quiescence else self.evaluate(board)), []
+        self.check_time()
+        child_ext = self.child_extension(board, ext)
+        best_action = None
+        if self.tt is not None:
+            result, best_action = self._probe(board, remaining, alpha, beta)
+            if result is not None and depth > 0:
+                self.stats.tt_hits += 1
+                return result
+        alpha_orig = alpha
 
         max_score = float("-inf")
         max_score_actions = None
         # Prune the legal actions
-        legal_actions = board.get_legal_actions()
-        if self.pruning_actions and len(legal_actions) > self.pruning_actions:
-            legal_actions = random.sample(legal_actions, self.pruning_actions)
+        legal_actions = self.prune_actions(board, 2 * depth, [pv[0] if pv else None, best_action])
 
         for action in legal_actions:
-            score, actions = self.min_value(board.generate_successor_state(action), depth, alpha, beta)
+            self.play(board, action)
+            score, actions = self.min_value(board, depth, alpha, beta, pv[1:] if pv and action == pv[0] else None,
+                                            child_ext)
+            self.undo(board)
             if score > max_score:
                 max_score = score
                 max_score_actions = [action] + actions
 
             if max_score > beta:
+                self.stats.add_cutoff(2 * depth)
+                self.move_orderer.record_cutoff(board.next, action, 2 * depth, remaining)
+                if self.tt is not None:
+                    self.tt.store_board(board, remaining, max_score, LOWER, max_score_actions[0])
                 return max_score, max_score_actions
 
             if max_score > alpha:
                 alpha = max_score
 
+        if self.tt is not None:
+            flag = UPPER if max_score <= alpha_orig else EXACT
+            self.tt.store_board(board, remaining, max_score, flag, max_score_actions[0])
         return max_score, max_score_actions
 
-    def min_value(self, board, depth, alpha, beta):
+    def min_value(self, board, depth, alpha, beta, pv=None, ext=0):
         """Return the lowest score and the corresponding subsequent actions"""
-        if self.terminal_test(board) or depth == self.depth:
-            return self.eval_func(board, self.color), []
+        if self.terminal_test(board):
+            return self.evaluate(board), []
+        remaining = 2 * self.depth + ext - 2 * depth - 1  # Remaining plies
+        if remaining <= 0:
+            return (self.quiescence_value(board) if self.quiescence else self.evaluate(board)), []
+        self.check_time()
+        child_ext = self.child_extension(board, ext)
+        best_action = None
+        if self.tt is not None:
+            result, best_action = self._probe(board, remaining, alpha, beta)
+            if result is not None:
+                self.stats.tt_hits += 1
+                return result
+        beta_orig = beta
 
         min_score = float("inf")
         min_score_actions = None
         # Prune the legal actions
-        legal_actions = board.get_legal_actions()
-        if self.pruning_actions and len(legal_actions) > self.pruning_actions:
-            legal_actions = random.sample(legal_actions, self.pruning_actions)
+        legal_actions = self.prune_actions(board, 2 * depth + 1, [pv[0] if pv else None, best_action])
 
         for action in legal_actions:
-            score, actions = self.max_value(board.generate_successor_state(action), depth+1, alpha, beta)
+            self.play(board, action)
+            score, actions = self.max_value(board, depth+1, alpha, beta, pv[1:] if pv and action == pv[0] else None,
+                                            child_ext)
+            self.undo(board)
             if score < min_score:
                 min_score = score
                 min_score_actions = [action] + actions
 
             if min_score < alpha:
+                self.stats.add_cutoff(2 * depth + 1)
+                self.move_orderer.record_cutoff(board.next, action, 2 * depth + 1, remaining)
+                if self.tt is not None:
+                    self.tt.store_board(board, remaining, min_score, UPPER, min_score_actions[0])
                 return min_score, min_score_actions
 
             if min_score < beta:
                 beta = min_score
 
+        if self.tt is not None:
+            flag = LOWER if min_score >= beta_orig else EXACT
+            self.tt.store_board(board, remaining, min_score, flag, min_score_actions[0])
         return min_score, min_score_actions
 
+    def quiescence_value(self, board):
+        """
+        Return the score of a horizon node, with a capture-only quiescence search: the evaluation, unless the side to
+        move can capture (a win), or has no action to save its endangered groups from a capture in the next ply.
+        """
+        if self.terminal_test(board) or not is_forced(board):
+            return self.evaluate(board)
+        legal_actions = board.get_legal_actions()
+        if tactical_score(board, legal_actions[0]) != CAPTURE:
+            # Saving actions; the side to move is captured if all of them leave an endangered group of its own
+            for action in legal_actions:
+                self.play(board, action)
+                escaped = all(group.color == board.next for group in board.endangered_groups)
+                self.undo(board)
+                if escaped:
+                    return self.evaluate(board)
+        # All legal actions are captures (which win equally), or all saving actions are captured
+        self.play(board, legal_actions[0])
+        score = self.quiescence_value(board)
+        self.undo(board)
+        return score
+
 
 class ExpectimaxAgent(SearchAgent):
-    """Assume uniform distribution for opponent"""
-    def __init__(self, color, depth, eval_func=evaluate):
-        super().__init__(color, depth, eval_func)
+    """
+    Assume uniform distribution for opponent, over its first pruning_actions actions in search order.
+    Chance nodes are pruned with Star1: as all scores are within eval_bounds, the expected score is bounded after
+    each child, and the node is cut as soon as it is proven to be outside the (alpha, beta) window of its max node.
+    """
+    def __init__(self, color, depth, eval_func=evaluate, move_time=None, num_workers=None, eval_bounds=SCORE_BOUNDS,
+                 solver_nodes=None):
+        """
+        :param eval_bounds: (lowest, highest) score of eval_func; None to disable pruning
+        """
+        super().__init__(color, depth, eval_func, move_time=move_time, num_workers=num_workers,
+                         solver_nodes=solver_nodes)
+        self.eval_bounds = eval_bounds
+        self.worker_options.update(eval_bounds=eval_bounds)
 
     def get_action(self, board, pruning_actions=16):
         self.pruning_actions = pruning_actions
-        score, actions = self.max_value(board, 0)
+        self.new_search()
+        score, actions = self.search(board, self.search_root)
         return actions[0] if len(actions) > 0 else None
 
-    def max_value(self, board, depth):
+    def search_root(self, board, pv):
+        if self.parallel is None:
+            return self.max_value(board, 0, pv)
+        return self.parallel_root(board, [pv[0] if pv else None])
+
+    def root_child_value(self, board, alpha, ext=0):
+        return self.expected_value(board, 0, alpha)
+
+    def max_value(self, board, depth, pv=None, alpha=float("-inf"), beta=float("inf")):
+        """
+        Return the highest score and the corresponding subsequent actions; fail-soft: a score <= alpha is an upper
+        bound and a score >= beta is a lower bound.
+        """
         if self.terminal_test(board) or depth == self.depth:
-            return self.eval_func(board, self.color), []
+            return self.evaluate(board), []
+        self.check_time()
 
         max_score = float("-inf")
         max_score_actions = None
         # Prune the legal actions
-        legal_actions = board.get_legal_actions()
-        if self.pruning_actions and len(legal_actions) > self.pruning_actions:
-            legal_actions = random.sample(legal_actions, self.pruning_actions)
+        legal_actions = self.prune_actions(board, 2 * depth, [pv[0] if pv else None])
 
         for action in legal_actions:
-            score, actions = self.expected_value(board.generate_successor_state(action), depth)
+            self.play(board, action)
+            score, actions = self.expected_value(board, depth, max(alpha, max_score), beta)
+            self.undo(board)
             if score > max_score:
                 max_score = score
                 max_score_actions = [action] + actions
+            if max_score >= beta:
+                break
 
+        if max_score >= beta:
+            self.stats.add_cutoff(2 * depth)
+        # Credit the best action (or the cutoff action)
+        self.move_orderer.record_cutoff(board.next, max_score_actions[0], 2 * depth, 2 * (self.depth - depth))
         return max_score, max_score_actions
 
-    def expected_value(self, board, depth):
+    def expected_value(self, board, depth, alpha=float("-inf"), beta=float("inf")):
+        """
+        Return the expected score over the actions of the opponent (uniform), and no actions;
+        fail-soft as max_value() if eval_bounds are given.
+        """
         if self.terminal_test(board) or depth == self.depth:
-            return self.eval_func(board, self.color), []
+            return self.evaluate(board), []
+        self.check_time()
 
         expected_score = 0.0
         # Prune the legal actions
-        legal_actions = board.get_legal_actions()
-        if self.pruning_actions and len(legal_actions) > self.pruning_actions:
-            legal_actions = random.sample(legal_actions, self.pruning_actions)
-
-        for action in legal_actions:
-            score, actions = self.max_value(board.generate_successor_state(action), depth+1)
-            expected_score += score / len(legal_actions)
+        legal_actions = self.prune_actions(board, 2 * depth + 1)
+        num_actions = len(legal_actions)
+
+        if self.eval_bounds is None:
+            for action in legal_actions:
+                self.play(board, action)
+                score, actions = self.max_value(board, depth+1)
+                self.undo(board)
+                expected_score += score / num_actions
+            return expected_score, []
+
+        # Star1: search the children with the window that can still change the result
+        lowest, highest = self.eval_bounds
+        score_sum = 0.0  # Sum of the scores of the searched children
+        for i, action in enumerate(legal_actions):
+            child_alpha = num_actions * alpha - score_sum - highest * (num_actions - i - 1)
+            child_beta = num_actions * beta - score_sum - lowest * (num_actions - i - 1)
+            self.play(board, action)
+            score, actions = self.max_value(board, depth+1, alpha=max(child_alpha, lowest),
+                                            beta=min(child_beta, highest))
+            self.undo(board)
+            if score <= child_alpha:
+                self.stats.add_cutoff(2 * depth + 1)
+                return (score_sum + score + highest * (num_actions - i - 1)) / num_actions, []
+            if score >= child_beta:
+                self.stats.add_cutoff(2 * depth + 1)
+                return (score_sum + score + lowest * (num_actions - i - 1)) / num_actions, []
+            score_sum += score
+            expected_score += score / num_actions
 
         return expected_score, []
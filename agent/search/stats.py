@@ -0,0 +1,90 @@
+"""
+Statistics of one search of search_agent (one get_action() call), to tune depth and pruning against latency targets.
+"""
+
+
+class SearchStats:
+    def __init__(self):
+        self.nodes = 0  # Positions visited (actions played)
+        self.leaf_evals = 0  # Calls of eval_func
+        self.cutoffs = {}  # {ply: number of cutoffs}
+        self.tt_hits = 0  # Nodes settled by the transposition table
+        self.solver_nodes = 0  # Positions expanded by the proof-number solver before the search
+        self.eval_time = 0.0  # Seconds in eval_func
+        self.move_time = 0.0  # Seconds applying and reverting actions (play and undo)
+        self.ordering_time = 0.0  # Seconds generating and ordering legal actions
+        self.time_elapsed = 0.0
+        self.depth = None  # Depth of the last completed search
+        self.score = None
+        self.pv = None  # Principal variation: the best action and the expected subsequent actions
+
+    def add_cutoff(self, ply):
+        self.cutoffs[ply] = self.cutoffs.get(ply, 0) + 1
+
+    @property
+    def nps(self):
+        """Nodes per second."""
+        return self.nodes / self.time_elapsed if self.time_elapsed > 0 else 0.0
+
+    def merge(self, stats):
+        """Add the counters of another search, such as a worker's part of a root-parallel search (a dict)."""
+        self.nodes += stats['nodes']
+        self.leaf_evals += stats['leaf_evals']
+        for ply, num_cutoffs in stats['cutoffs'].items():
+            self.cutoffs[int(ply)] = self.cutoffs.get(int(ply), 0) + num_cutoffs
+        self.tt_hits += stats['tt_hits']
+        self.eval_time += stats['eval_time']
+        self.move_time += stats['move_time']
+        self.ordering_time += stats['ordering_time']
+
+    def to_dict(self):
+        return {
+            'nodes': self.nodes,
+            'leaf_evals': self.leaf_evals,
+            'cutoffs': dict(sorted(self.cutoffs.items())),
+            'tt_hits': self.tt_hits,
+            'solver_nodes': self.solver_nodes,
+            'eval_time': self.eval_time,
+            'move_time': self.move_time,
+            'ordering_time': self.ordering_time,
+            'time_elapsed': self.time_elapsed,
+            'nps': self.nps,
+            'depth': self.depth,
+            'score': self.score,
+            'pv': self.pv
+        }
+
+    def __str__(self):
+        return 'depth %s; score %s; nodes %d (%.0f/s); evals %d; cutoffs %d; time: %.3fs (eval %.3fs, move %.3fs, ' \
+               'ordering %.3fs)' % (self.depth, self.score, self.nodes, self.nps, self.leaf_evals,
+                                    sum(self.cutoffs.values()), self.time_elapsed, self.eval_time, self.move_time,
+                                    self.ordering_time)
+
+
+def aggregate(list_stats):
+    """
+    Aggregate the stats dicts of many searches (e.g. all moves of an agent in a match or a benchmark).
+    :return: dict of totals and means
+    """
+    num_searches = len(list_stats)
+    if num_searches == 0:
+        return {'num_searches': 0}
+    total = {key: sum(stats[key] for stats in list_stats)
+             for key in ('nodes', 'leaf_evals', 'tt_hits', 'solver_nodes', 'eval_time', 'move_time', 'ordering_time',
+                         'time_elapsed')}
+    cutoffs = {}
+    for stats in list_stats:
+        for ply, num_cutoffs in stats['cutoffs'].items():
+            cutoffs[int(ply)] = cutoffs.get(int(ply), 0) + num_cutoffs
+    depths = [stats['depth'] for stats in list_stats if stats['depth'] is not None]
+    return {
+        'num_searches': num_searches,
+        'total': total,
+        'cutoffs': dict(sorted(cutoffs.items())),
+        'nodes_mean': total['nodes'] / num_searches,
+        'nps': total['nodes'] / total['time_elapsed'] if total['time_elapsed'] > 0 else 0.0,
+        'depth_mean': sum(depths) / len(depths) if depths else None,
+        'eval_time_share': total['eval_time'] / total['time_elapsed'] if total['time_elapsed'] > 0 else 0.0,
+        'move_time_share': total['move_time'] / total['time_elapsed'] if total['time_elapsed'] > 0 else 0.0,
+        'ordering_time_share': total['ordering_time'] / total['time_elapsed'] if total['time_elapsed'] > 0 else 0.0
+    }
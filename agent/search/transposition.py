@@ -0,0 +1,74 @@
+from game.symmetry import canonical_symmetry, canonical_key, to_canonical, from_canonical
+"""
+Transposition table for search_agent, keyed by Board.zobrist_key, or by the canonical key under board symmetries.
+"""
+
+EXACT = 0
+LOWER = 1  # Score is a lower bound (beta cutoff)
+UPPER = 2  # Score is an upper bound (no move raised alpha)
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of two-slot buckets: the first slot is depth-preferred, the second is always-replace.
+    Each entry is a tuple (key, depth, score, flag, best_action, generation); entries from older searches
+    can always be replaced, so the table can persist across get_action() calls without filling up with stale entries.
+    """
+    def __init__(self, num_entries=2 ** 16, symmetric=False):
+        """
+        :param num_entries: memory cap in number of entries; rounded down to an even number
+        :param symmetric: if True, probe_board() and store_board() share entries among the 8 symmetric orientations
+                          of a position (see game.symmetry), with best actions stored in the canonical orientation;
+                          the evaluation must then be symmetric, else the orientations share scores that differ
+        """
+        self.symmetric = symmetric
+        self.num_buckets = max(num_entries // 2, 1)
+        self.table = [None] * (self.num_buckets * 2)
+        self.generation = 0
+
+    def new_search(self):
+        """Call at the start of each search so that entries of previous searches age out."""
+        self.generation += 1
+
+    def clear(self):
+        self.table = [None] * (self.num_buckets * 2)
+
+    def probe(self, key):
+        """Return the entry of the key, or None."""
+        idx = (key % self.num_buckets) * 2
+        entry = self.table[idx]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.table[idx + 1]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, flag, best_action):
+        idx = (key % self.num_buckets) * 2
+        entry = (key, depth, score, flag, best_action, self.generation)
+        preferred = self.table[idx]
+        if preferred is None or preferred[0] == key or preferred[5] != self.generation or depth >= preferred[1]:
+            self.table[idx] = entry
+        else:
+            self.table[idx + 1] = entry
+
+    def probe_board(self, board):
+        """Return the entry of the board, with the best action in the orientation of the board; or None."""
+        if not self.symmetric:
+            return self.probe(board.zobrist_key)
+        entry = self.probe(canonical_key(board))
+        if entry is None or entry[4] is None:
+            return entry
+        return entry[:4] + (from_canonical(board, entry[4]),) + entry[5:]
+
+    def store_board(self, board, depth, score, flag, best_action):
+        if not self.symmetric:
+            self.store(board.zobrist_key, depth, score, flag, best_action)
+            return
+        k = canonical_symmetry(board)
+        self.store(canonical_key(board), depth, score, flag,
+                   to_canonical(board, best_action, k) if best_action is not None else None)
+
+    def __len__(self):
+        return sum(1 for entry in self.table if entry is not None)
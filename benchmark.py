@@ -1,17 +1,146 @@
-from match import Match
-from agent.basic_agent import RandomAgent, GreedyAgent
-from agent.search.search_agent import AlphaBetaAgent, ExpectimaxAgent
-from agent.rl.rl_agent import ApproxQAgent
-from agent.rl.rl_env import RlEnv
+from match import Match, get_agent, get_board_cls
+from agent.search.stats import aggregate
+from game.go import Board, opponent_color
 from statistics import mean
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import json
+import math
+import random
+import numpy as np
+
+
+def play_game(agent_black, agent_white, board_cls=Board, seed=None, gui=False):
+    """
+    Play one game; seed `random` and `numpy.random` (used by evaluate) first if a seed is given.
+    :return: the finished match
+    """
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    match = Match(agent_black=agent_black, agent_white=agent_white, gui=gui, board_cls=board_cls)
+    match.start()
+    return match
+
+
+def _play_game_record(game, agent_self, agent_oppo, board_cls, seed, in_pool=True):
+    """Play one headless game and return its record (see Benchmark.iter_games()); also the process pool worker."""
+    if in_pool:
+        for agent in (agent_self, agent_oppo):
+            if getattr(agent, 'parallel', None) is not None:
+                agent.parallel = None  # Games are already in parallel; no nested pools of search agents
+    if agent_self.color == 'BLACK':
+        match = play_game(agent_self, agent_oppo, board_cls, seed)
+    else:
+        match = play_game(agent_oppo, agent_self, board_cls, seed)
+    return {
+        'game': game,
+        'seed': seed,
+        'color': agent_self.color,
+        'winner': match.winner,
+        'win': match.winner == agent_self.color,
+        'end_by_no_legal_actions': match.board.end_by_no_legal_actions,
+        'num_moves': match.counter_move,
+        'time_elapsed': match.time_elapsed,
+        'latencies': match.move_latencies[agent_self.color],
+        'search_stats': match.search_stats[agent_self.color]
+    }
+
+
+def wilson_interval(num_wins, num_games, z=1.96):
+    """Confidence interval of the win rate (95% for z=1.96), by Wilson score interval."""
+    if num_games == 0:
+        return 0.0, 1.0
+    p = num_wins / num_games
+    denominator = 1 + z * z / num_games
+    center = (p + z * z / (2 * num_games)) / denominator
+    half = z * math.sqrt(p * (1 - p) / num_games + z * z / (4 * num_games * num_games)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of sorted values; q in [0, 100]."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(math.ceil(q / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(records):
+    """Aggregate game records: win rate with 95% confidence interval, means, latency percentiles of agent_self."""
+    num_games = len(records)
+    num_wins = sum(record['win'] for record in records)
+    latencies = sorted(latency for record in records for latency in record['latencies'])
+    return {
+        'num_games': num_games,
+        'win_rate': num_wins / num_games if num_games else 0.0,
+        'win_rate_ci': wilson_interval(num_wins, num_games),
+        'win_rate_by_color': {color: mean([record['win'] for record in records if record['color'] == color])
+                              for color in ('BLACK', 'WHITE') if any(r['color'] == color for r in records)},
+        'num_moves_mean': mean([record['num_moves'] for record in records]) if records else 0.0,
+        'time_elapsed_mean': mean([record['time_elapsed'] for record in records]) if records else 0.0,
+        'latency_percentiles': {q: percentile(latencies, q) for q in (50, 90, 99, 100)},
+        'search': aggregate([stats for record in records for stats in record['search_stats']])
+    }
+
+
+def elo_to_win_rate(elo):
+    """Expected win rate of a player that is `elo` Elo points stronger than the opponent."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class SPRT:
+    """
+    Sequential probability ratio test on the win rate p of agent_self (there are no draws in this game):
+    H0: p = p0 against H1: p = p1, with type I error alpha and type II error beta.
+    After each game the log-likelihood ratio is compared with the bounds; the test stops once it leaves them.
+    """
+    def __init__(self, p0, p1, alpha=0.05, beta=0.05):
+        if not 0 < p0 < p1 < 1:
+            raise ValueError('Must have 0 < p0 < p1 < 1!')
+        self.p0 = p0
+        self.p1 = p1
+        self.lower = math.log(beta / (1 - alpha))  # Accept H0 at or below
+        self.upper = math.log((1 - beta) / alpha)  # Accept H1 at or above
+        self.num_wins = 0
+        self.num_losses = 0
+
+    @classmethod
+    def from_elo(cls, elo0, elo1, alpha=0.05, beta=0.05):
+        """Hypotheses as the Elo difference of agent_self over agent_oppo."""
+        return cls(elo_to_win_rate(elo0), elo_to_win_rate(elo1), alpha, beta)
+
+    def update(self, win):
+        if win:
+            self.num_wins += 1
+        else:
+            self.num_losses += 1
+
+    @property
+    def llr(self):
+        return self.num_wins * math.log(self.p1 / self.p0) + \
+            self.num_losses * math.log((1 - self.p1) / (1 - self.p0))
+
+    @property
+    def result(self):
+        """'H0', 'H1', or None if not decided yet."""
+        llr = self.llr
+        if llr <= self.lower:
+            return 'H0'
+        elif llr >= self.upper:
+            return 'H1'
+        return None
 
 
 class Benchmark:
-    def __init__(self, agent_self, agent_oppo):
+    def __init__(self, agent_self, agent_oppo, board_cls=Board):
         """
         :param agent_self: the agent to evaluate
         :param agent_oppo: the opponent agent, such as RandomAgent, GreedyAgent
+        :param board_cls: the game engine, Board or BitBoard
         """
+        self.board_cls = board_cls
         if (agent_self.color == 'BLACK' and agent_oppo.color == 'WHITE') \
                 or (agent_self.color == 'WHITE' and agent_oppo.color == 'BLACK'):
             self.agent_self = agent_self
@@ -21,9 +150,78 @@ class Benchmark:
 
     def create_match(self, gui=False):
         if self.agent_self.color == 'BLACK':
-            return Match(agent_black=self.agent_self, agent_white=self.agent_oppo, gui=gui)
+            return Match(agent_black=self.agent_self, agent_white=self.agent_oppo, gui=gui, board_cls=self.board_cls)
         else:
-            return Match(agent_white=self.agent_self, agent_black=self.agent_oppo, gui=gui)
+            return Match(agent_white=self.agent_self, agent_black=self.agent_oppo, gui=gui, board_cls=self.board_cls)
+
+    def iter_games(self, num_tests, num_processes=None, seed=0, alternate_colors=True):
+        """
+        Play headless games, in parallel if num_processes is given; yield the record of each game as it completes.
+        Every game is played by fresh copies of the agents, so games don't share any agent state
+        (such as transposition tables) and each game is reproducible from its seed.
+        :param seed: game i is seeded with seed + i
+        :param alternate_colors: if True, agent_self plays its own color in even games and the other color in odd games
+        :return: generator of dicts: game, seed, color (of agent_self), winner, win, end_by_no_legal_actions,
+        num_moves, time_elapsed, latencies (seconds per move of agent_self),
+        search_stats (SearchStats dicts per move of agent_self, if it is a search agent)
+        """
+        pairs = [(self.agent_self, self.agent_oppo)]
+        if alternate_colors:
+            swapped_self, swapped_oppo = copy.deepcopy(self.agent_self), copy.deepcopy(self.agent_oppo)
+            swapped_self.color, swapped_oppo.color = swapped_oppo.color, swapped_self.color
+            pairs.append((swapped_self, swapped_oppo))
+        games = [(i, pairs[i % len(pairs)][0], pairs[i % len(pairs)][1], self.board_cls, seed + i)
+                 for i in range(num_tests)]
+
+        if not num_processes:
+            for i, agent_self, agent_oppo, board_cls, game_seed in games:
+                agent_self, agent_oppo = copy.deepcopy(agent_self), copy.deepcopy(agent_oppo)
+                try:
+                    yield _play_game_record(i, agent_self, agent_oppo, board_cls, game_seed, in_pool=False)
+                finally:
+                    for agent in (agent_self, agent_oppo):
+                        if hasattr(agent, 'close'):
+                            agent.close()
+            return
+        executor = ProcessPoolExecutor(num_processes)
+        try:
+            futures = [executor.submit(_play_game_record, *game) for game in games]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def run_games(self, num_tests, num_processes=None, seed=0, alternate_colors=True, verbose=True):
+        """Play all games of iter_games(), printing each as it completes; return the records in game order."""
+        records = []
+        for record in self.iter_games(num_tests, num_processes, seed, alternate_colors):
+            records.append(record)
+            if verbose:
+                print('Game %d (%d/%d): agent as %s; winner: %s in %d moves' % (
+                    record['game'], len(records), num_tests, record['color'], record['winner'], record['num_moves']))
+        return sorted(records, key=lambda record: record['game'])
+
+    def run_sprt(self, sprt, max_games, num_processes=None, seed=0, alternate_colors=True, verbose=True):
+        """
+        Play games of iter_games() until the SPRT is decided or max_games are played; print the test after each game.
+        Games still running when the test is decided are finished, but not counted; pending games are cancelled.
+        :return: the test result ('H0', 'H1' or None), and the counted records in game order
+        """
+        records = []
+        games = self.iter_games(max_games, num_processes, seed, alternate_colors)
+        try:
+            for record in games:
+                records.append(record)
+                sprt.update(record['win'])
+                if verbose:
+                    print('Game %d (%d/%d): W %d L %d; LLR %.3f in (%.3f, %.3f)' % (
+                        record['game'], len(records), max_games, sprt.num_wins, sprt.num_losses,
+                        sprt.llr, sprt.lower, sprt.upper))
+                if sprt.result is not None:
+                    break
+        finally:
+            games.close()
+        return sprt.result, sorted(records, key=lambda record: record['game'])
 
     def run_benchmark(self, num_tests, gui=False):
         list_win = []
@@ -46,18 +244,104 @@ class Benchmark:
         return win_mean, num_moves_mean, time_elapsed_mean
 
 
+def get_args():
+    parser = ArgumentParser('Mini Go Game Benchmark')
+    parser.add_argument('-a', '--agent_self', default='minimax',
+                        help='the agent to evaluate: random; greedy; minimax; expectimax, mcts, approx-q; '
+                             'DEFAULT is minimax')
+    parser.add_argument('-o', '--agent_oppo', default='random',
+                        help='the opponent agent: random; greedy; minimax; expectimax, mcts, approx-q; '
+                             'DEFAULT is random')
+    parser.add_argument('-c', '--color', default='BLACK',
+                        help='the color of the agent to evaluate; DEFAULT is BLACK')
+    parser.add_argument('-n', '--num_tests', type=int, default=100,
+                        help='the number of games; DEFAULT is 100')
+    parser.add_argument('-d', '--search_depth', type=int, default=1,
+                        help='the search depth for searching agents if applicable; DEFAULT is 1')
+    parser.add_argument('-t', '--move_time', type=float, default=None,
+                        help='if not None, time budget in seconds per move for searching agents; DEFAULT is None')
+    parser.add_argument('-p', '--num_workers', type=int, default=None,
+                        help='if not None, number of processes for searching agents to search root actions in '
+                             'parallel; DEFAULT is None')
+    parser.add_argument('--solver_nodes', type=int, default=None,
+                        help='if not None, node budget of the proof-number solver that searching agents try before '
+                             'searching, to play a proven forced win directly; DEFAULT is None')
+    parser.add_argument('-e', '--engine', default='board',
+                        help='possible engines: board; bitboard; DEFAULT is board')
+    parser.add_argument('-j', '--num_processes', type=int, default=None,
+                        help='if not None, number of processes to play games in parallel; search agents then search '
+                             'without their own worker pools; DEFAULT is None')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='game i is seeded with seed + i; DEFAULT is 0')
+    parser.add_argument('-f', '--fixed_color', action='store_true',
+                        help='always play the agent to evaluate with --color, instead of alternating colors')
+    parser.add_argument('-r', '--records', default=None,
+                        help='if not None, write the record of every game to this file as JSON lines; DEFAULT is None')
+    parser.add_argument('--sprt_elo', type=float, nargs=2, default=None, metavar=('ELO0', 'ELO1'),
+                        help='if not None, stop early by SPRT with H0: Elo difference ELO0 against H1: ELO1; '
+                             'num_tests is then the maximum number of games; DEFAULT is None')
+    parser.add_argument('--sprt_win_rate', type=float, nargs=2, default=None, metavar=('P0', 'P1'),
+                        help='same as --sprt_elo, with hypotheses as win rates of the agent to evaluate; '
+                             'DEFAULT is None')
+    parser.add_argument('--sprt_alpha', type=float, default=0.05,
+                        help='type I error of SPRT (accepting H1 when H0 holds); DEFAULT is 0.05')
+    parser.add_argument('--sprt_beta', type=float, default=0.05,
+                        help='type II error of SPRT (accepting H0 when H1 holds); DEFAULT is 0.05')
+    parser.add_argument('-g', '--gui', action='store_true',
+                        help='show GUI of every game, one game after another (no seeds, no records)')
+    return parser.parse_args()
+
+
+def print_summary(summary):
+    low, high = summary['win_rate_ci']
+    print('Win rate: %f (95%% CI: %f - %f) over %d games' % (summary['win_rate'], low, high, summary['num_games']))
+    for color, win_rate in summary['win_rate_by_color'].items():
+        print('Win rate as %s: %f' % (color, win_rate))
+    print('Avg # moves: %f; Avg time: %f' % (summary['num_moves_mean'], summary['time_elapsed_mean']))
+    if summary['latency_percentiles'][100] is not None:
+        print('Move latency: ' + '; '.join('p%d %.4fs' % (q, latency) if q < 100 else 'max %.4fs' % latency
+                                           for q, latency in summary['latency_percentiles'].items()))
+    search = summary['search']
+    if search['num_searches']:
+        print('Search: %d nodes per move; %.0f nodes/s; depth %s; eval %.0f%%, move %.0f%%, ordering %.0f%% of time; '
+              'cutoffs by ply: %s' % (search['nodes_mean'], search['nps'], search['depth_mean'],
+                                      search['eval_time_share'] * 100, search['move_time_share'] * 100,
+                                      search['ordering_time_share'] * 100, search['cutoffs']))
+
+
+def main():
+    args = get_args()
+    color_oppo = opponent_color(args.color)
+    agent_self = get_agent(args.agent_self, args.color, args.search_depth, args.move_time, args.num_workers,
+                           args.solver_nodes)
+    agent_oppo = get_agent(args.agent_oppo, color_oppo, args.search_depth, args.move_time, args.num_workers,
+                           args.solver_nodes)
+    print('Agent to evaluate: ' + str(agent_self))
+    print('Opponent agent: ' + str(agent_oppo))
+
+    benchmark = Benchmark(agent_self=agent_self, agent_oppo=agent_oppo, board_cls=get_board_cls(args.engine))
+    if args.gui:
+        win_mean, num_moves_mean, time_elapsed_mean = benchmark.run_benchmark(args.num_tests, gui=True)
+        print('Win rate: %f; Avg # moves: %f; Avg time: %f' % (win_mean, num_moves_mean, time_elapsed_mean))
+        return
+
+    if args.sprt_elo or args.sprt_win_rate:
+        if args.sprt_elo:
+            sprt = SPRT.from_elo(args.sprt_elo[0], args.sprt_elo[1], args.sprt_alpha, args.sprt_beta)
+        else:
+            sprt = SPRT(args.sprt_win_rate[0], args.sprt_win_rate[1], args.sprt_alpha, args.sprt_beta)
+        print('SPRT: H0 win rate %f; H1 win rate %f' % (sprt.p0, sprt.p1))
+        result, records = benchmark.run_sprt(sprt, args.num_tests, args.num_processes, args.seed,
+                                             not args.fixed_color)
+        print('SPRT result: ' + ('accept ' + result if result else 'undecided') + ' after %d games' % len(records))
+    else:
+        records = benchmark.run_games(args.num_tests, args.num_processes, args.seed, not args.fixed_color)
+    if args.records:
+        with open(args.records, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+    print_summary(summarize(records))
+
+
 if __name__ == '__main__':
-    # agent_self = RandomAgent('BLACK')
-    # agent_self = GreedyAgent('BLACK')
-    # agent_self = AlphaBetaAgent('BLACK', 1)
-    # agent_self = ExpectimaxAgent('BLACK', 1)
-    agent_self = ApproxQAgent('WHITE', RlEnv())
-    agent_self.load('agent/rl/ApproxQAgent_1e-3.npy')
-
-    # agent_oppo = RandomAgent('WHITE')
-    # agent_oppo = GreedyAgent('WHITE')
-    agent_oppo = AlphaBetaAgent('BLACK', 1)
-
-    benchmark = Benchmark(agent_self=agent_self, agent_oppo=agent_oppo)
-    win_mean, num_moves_mean, time_elapsed_mean = benchmark.run_benchmark(100, gui=True)
-    print('Win rate: %f; Avg # moves: %f; Avg time: %f' % (win_mean, num_moves_mean, time_elapsed_mean))
+    main()
@@ -0,0 +1,279 @@
+from match import get_board_cls
+from game.go import BOARD_SIZES
+from agent.search.evaluation import evaluate
+from agent.rl.rl_env import RlEnv, RlEnv2
+from argparse import ArgumentParser
+import hashlib
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+"""
+Micro-benchmarks of the game engine over a corpus of reproducible positions, with JSON baselines and regression checks,
+and memory benchmarks of boards and search trees.
+"""
+
+
+def random_game(board_cls, rng):
+    """
+    Play a full game with uniformly random legal actions; return the list of boards before every move.
+    Actions are drawn from the sorted legal actions, so that the games don't depend on the order of the engine.
+    """
+    board = board_cls(next_color='BLACK')
+    board.put_stone(board.center, check_legal=False)
+    boards = []
+    while board.winner is None:
+        boards.append(board.copy())
+        board.put_stone(rng.choice(sorted(board.get_legal_actions())), check_legal=False)
+    return boards
+
+
+def build_corpus(board_cls, num_games=20, seed=0):
+    """
+    Positions from seeded random games (every position before a move, except the first move on the center).
+    :return: list of (board, action), with a random legal action of the position
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(num_games):
+        for board in random_game(board_cls, rng):
+            corpus.append((board, rng.choice(sorted(board.get_legal_actions()))))
+    return corpus
+
+
+def corpus_fingerprint(corpus):
+    """Hash of the positions and actions of the corpus, same for all engines; baselines only compare equal corpora."""
+    positions = []
+    for board, action in corpus:
+        next_color, counter_move, winner, black, white, size = board.to_compact()
+        positions.append((next_color, counter_move, winner, sorted(black), sorted(white), size, action))
+    return hashlib.sha1(repr(positions).encode()).hexdigest()
+
+
+def _time_per_call(func, items, repeat):
+    """Best of `repeat` runs of func over all items; return seconds per call."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items)
+
+
+def _time_put_stone(corpus, repeat):
+    """put_stone() alone: the boards to play on are copied before the timer starts."""
+    best = float('inf')
+    for _ in range(repeat):
+        boards = [(board.copy(), action) for board, action in corpus]
+        start = time.perf_counter()
+        for board, action in boards:
+            board.put_stone(action)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus)
+
+
+def _time_random_games(board_cls, num_games, seed, repeat, size=19):
+    """Full random games from the start; return seconds per game, and moves per game."""
+    best = float('inf')
+    for _ in range(repeat):
+        rng = random.Random(seed)
+        num_moves = 0
+        start = time.perf_counter()
+        for _ in range(num_games):
+            board = board_cls(next_color='BLACK', size=size)
+            board.put_stone(board.center, check_legal=False)
+            while board.winner is None:
+                board.put_stone(rng.choice(sorted(board.get_legal_actions())), check_legal=False)
+            num_moves += board.counter_move
+        best = min(best, time.perf_counter() - start)
+    return best / num_games, num_moves / num_games
+
+
+def run_benchmarks(board_cls, num_games=20, seed=0, repeat=5):
+    """
+    Time the engine operations over the corpus of build_corpus().
+    :return: {name: seconds per call}; random_game is seconds per full game; number of positions and
+             corpus_fingerprint() of the corpus
+    """
+    corpus = build_corpus(board_cls, num_games, seed)
+    np.random.seed(seed)  # evaluate() draws noise from numpy.random
+    results = {
+        'put_stone': _time_put_stone(corpus, repeat),
+        'copy': _time_per_call(lambda item: item[0].copy(), corpus, repeat),
+        'generate_successor_state': _time_per_call(lambda item: item[0].generate_successor_state(item[1]),
+                                                   corpus, repeat),
+        '_get_legal_actions': _time_per_call(lambda item: item[0]._get_legal_actions(), corpus, repeat),
+        'evaluate': _time_per_call(lambda item: evaluate(item[0], item[0].next), corpus, repeat),
+        'RlEnv.extract_features': _time_per_call(lambda item: RlEnv.extract_features(item[0], item[1], item[0].next),
+                                                 corpus, repeat),
+        'RlEnv2.extract_features': _time_per_call(lambda item: RlEnv2.extract_features(item[0], item[1],
+                                                                                       item[0].next),
+                                                  corpus, repeat),
+        'random_game': _time_random_games(board_cls, num_games, seed, repeat)[0]
+    }
+    return results, len(corpus), corpus_fingerprint(corpus)
+
+
+def run_scaling(board_cls, sizes=BOARD_SIZES, num_games=20, seed=0, repeat=5):
+    """
+    Time full random games on every board size.
+    :return: {size: (seconds per game, moves per game)}
+    """
+    return {size: _time_random_games(board_cls, num_games, seed, repeat, size) for size in sizes}
+
+
+def _allocated_bytes(build):
+    """Bytes allocated by build() and still held by its result (measured by tracemalloc); return bytes, result."""
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return tracemalloc.get_traced_memory()[0] - start, result
+    finally:
+        tracemalloc.stop()
+
+
+def search_tree(board, depth):
+    """All boards of the full game tree from the board to the depth, kept by generate_successor_state()."""
+    nodes = [board]
+    frontier = [board]
+    for _ in range(depth):
+        frontier = [node.generate_successor_state(action) for node in frontier if node.winner is None
+                    for action in node.get_legal_actions()]
+        nodes.extend(frontier)
+    return nodes
+
+
+def run_memory(board_cls, num_games=20, seed=0, depth=2, num_trees=10):
+    """
+    Memory held by boards of the corpus of build_corpus(), and by search trees of evenly spaced corpus positions.
+    :return: {name: bytes}: board (a board rebuilt from its stones), copy (a copy of an existing board),
+             tree (a full search tree to the depth) and tree_node (per board of the tree); and nodes per tree
+    """
+    boards = [board for board, _ in build_corpus(board_cls, num_games, seed)]
+    compacts = [board.to_compact() for board in boards]
+    num_bytes, _ = _allocated_bytes(lambda: [board_cls.from_compact(compact) for compact in compacts])
+    results = {'board': num_bytes / len(boards)}
+    num_bytes, _ = _allocated_bytes(lambda: [board.copy() for board in boards])
+    results['copy'] = num_bytes / len(boards)
+
+    roots = [boards[i * len(boards) // num_trees] for i in range(num_trees)]
+    num_bytes, trees = _allocated_bytes(lambda: [search_tree(root.copy(), depth) for root in roots])
+    num_nodes = sum(len(tree) for tree in trees)
+    results['tree'] = num_bytes / num_trees
+    results['tree_node'] = num_bytes / num_nodes
+    return results, num_nodes / num_trees
+
+
+def print_memory(results, depth, nodes_per_tree):
+    print('%-26s %12.0f bytes' % ('board', results['board']))
+    print('%-26s %12.0f bytes' % ('copy', results['copy']))
+    print('%-26s %12.0f bytes  (%.0f boards)' % ('tree of depth %d' % depth, results['tree'], nodes_per_tree))
+    print('%-26s %12.0f bytes' % ('tree node', results['tree_node']))
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare the results with the baseline results.
+    :param threshold: relative slowdown beyond which an operation is a regression, e.g. 0.1 for 10%
+    :return: list of (name, baseline seconds, seconds, relative change, is regression)
+    """
+    rows = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        rows.append((name, baseline[name], seconds, change, change > threshold))
+    return rows
+
+
+def print_scaling(scaling):
+    print('%-6s %14s %12s %12s %12s' % ('size', 'us/game', 'moves/game', 'us/move', 'moves/s'))
+    for size, (seconds, moves) in scaling.items():
+        print('%-6s %14.1f %12.1f %12.2f %12.0f' % ('%dx%d' % (size, size), seconds * 1e6, moves,
+                                                    seconds / moves * 1e6, moves / seconds))
+
+
+def print_results(results, num_positions):
+    print('%d positions' % num_positions)
+    for name, seconds in results.items():
+        if name == 'random_game':
+            print('%-26s %12.1f us/game  %10.1f games/s' % (name, seconds * 1e6, 1 / seconds))
+        else:
+            print('%-26s %12.2f us/call  %10.0f calls/s' % (name, seconds * 1e6, 1 / seconds))
+
+
+def get_args():
+    parser = ArgumentParser('Mini Go Game Engine Benchmark')
+    parser.add_argument('-e', '--engine', default='board',
+                        help='possible engines: board; bitboard; DEFAULT is board')
+    parser.add_argument('-n', '--num_games', type=int, default=20,
+                        help='the number of seeded random games that make the corpus of positions; DEFAULT is 20')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='the seed of the corpus; DEFAULT is 0')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='the number of runs of each benchmark; the best run is kept; DEFAULT is 5')
+    parser.add_argument('--scaling', action='store_true',
+                        help='if set, only time full random games on every board size (%s)' %
+                             ', '.join(str(size) for size in BOARD_SIZES))
+    parser.add_argument('--memory', type=int, default=None, metavar='DEPTH',
+                        help='if not None, only measure the memory of boards and of search trees of this depth; '
+                             'DEFAULT is None')
+    parser.add_argument('--save', default=None,
+                        help='if not None, write the results to this JSON baseline file; DEFAULT is None')
+    parser.add_argument('--baseline', default=None,
+                        help='if not None, compare with this JSON baseline file and exit with 1 on any regression; '
+                             'DEFAULT is None')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown that counts as regression; DEFAULT is 0.1 (10%%)')
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    if args.scaling:
+        print_scaling(run_scaling(get_board_cls(args.engine), num_games=args.num_games, seed=args.seed,
+                                  repeat=args.repeat))
+        return
+    if args.memory is not None:
+        results, nodes_per_tree = run_memory(get_board_cls(args.engine), args.num_games, args.seed, args.memory)
+        print_memory(results, args.memory, nodes_per_tree)
+        return
+
+    results, num_positions, fingerprint = run_benchmarks(get_board_cls(args.engine), args.num_games, args.seed,
+                                                         args.repeat)
+    print_results(results, num_positions)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'engine': args.engine, 'num_games': args.num_games, 'seed': args.seed,
+                       'fingerprint': fingerprint, 'python': platform.python_version(), 'results': results},
+                      f, indent=2)
+        print('Baseline saved in file ' + args.save)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('fingerprint') != fingerprint:
+            print('Baseline corpus differs (num_games %d, seed %d, fingerprint %s); not comparable, save a new '
+                  'baseline' % (baseline['num_games'], baseline['seed'], baseline.get('fingerprint')))
+            sys.exit(2)
+        rows = compare(results, baseline['results'], args.threshold)
+        print('Compared with baseline %s (engine %s, threshold %+.0f%%):' % (args.baseline, baseline['engine'],
+                                                                            args.threshold * 100))
+        for name, baseline_seconds, seconds, change, regression in rows:
+            print('%-26s %12.2f us -> %10.2f us  %+7.1f%%%s' % (name, baseline_seconds * 1e6, seconds * 1e6,
+                                                              change * 100, '  REGRESSION' if regression else ''))
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print('Regressions: ' + ', '.join(regressions))
+            sys.exit(1)
+        print('No regression')
+
+
+if __name__ == '__main__':
+    main()
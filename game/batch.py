@@ -0,0 +1,159 @@
+from game.go import BOARD_SIZE
+import numpy as np
+"""
+Vectorized environment: N games stepped in lockstep with NumPy, for high-throughput self-play and RL data generation.
+"""
+
+SIZE = BOARD_SIZE - 1  # Number of rows/cols
+NUM_POINTS = SIZE * SIZE
+BORDER = NUM_POINTS  # Index of the extra slot that all off-board neighbors point to
+EMPTY, BLACK, WHITE, OFF_BOARD = 0, 1, 2, 3
+COLOR_NAMES = {BLACK: 'BLACK', WHITE: 'WHITE'}
+CENTER = (10, 10)
+
+
+def point_to_action(point):
+    """Map a board point (1-based x, y) to a flat action index."""
+    return (point[0] - 1) * SIZE + (point[1] - 1)
+
+
+def action_to_point(action):
+    return int(action) // SIZE + 1, int(action) % SIZE + 1
+
+
+def _neighbor_table():
+    table = np.full((NUM_POINTS, 4), BORDER, dtype=np.int64)
+    for action in range(NUM_POINTS):
+        x, y = action_to_point(action)
+        for d, (nx, ny) in enumerate([(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]):
+            if 0 < nx <= SIZE and 0 < ny <= SIZE:
+                table[action, d] = point_to_action((nx, ny))
+    return table
+
+
+NEIGHBORS = _neighbor_table()  # (NUM_POINTS, 4) flat indices of neighbors, BORDER if off board
+
+
+class BatchBoard:
+    """
+    N games of the same rules as game.go.Board, stored as stacked arrays:
+    stones (N, NUM_POINTS + 1) with EMPTY/BLACK/WHITE (and OFF_BOARD in the extra border slot),
+    labels (N, NUM_POINTS + 1) with the group label of every stone (0 for empty),
+    num_liberties (N, NUM_POINTS + 1) with the number of liberties of every group label.
+    Actions are flat indices (see point_to_action()); BLACK's first move is always on the center, as in Match.
+    Finished games are frozen; their actions are ignored.
+    """
+    def __init__(self, num_games):
+        self.num_games = num_games
+        self.stones = np.zeros((num_games, NUM_POINTS + 1), dtype=np.int8)
+        self.stones[:, BORDER] = OFF_BOARD
+        self.labels = np.zeros((num_games, NUM_POINTS + 1), dtype=np.int64)
+        self.num_liberties = np.zeros((num_games, NUM_POINTS + 1), dtype=np.int64)
+        self.next = np.full(num_games, BLACK, dtype=np.int8)
+        self.winner = np.zeros(num_games, dtype=np.int8)  # EMPTY if the game is not over
+        self.end_by_no_legal_actions = np.zeros(num_games, dtype=bool)
+        self.counter_move = np.zeros(num_games, dtype=np.int64)
+
+        self.legal_mask = np.zeros((num_games, NUM_POINTS), dtype=bool)
+        self.legal_mask[:, point_to_action(CENTER)] = True
+
+    def get_legal_mask(self):
+        """(N, NUM_POINTS) boolean array of legal actions; all False for finished games."""
+        return self.legal_mask
+
+    def get_winners(self):
+        """Winner of each game: 'BLACK', 'WHITE' or None."""
+        return [COLOR_NAMES.get(int(winner)) for winner in self.winner]
+
+    def step(self, actions):
+        """
+        Apply one action per game; the actions of finished games are ignored.
+        :param actions: (N,) flat action indices; assumed legal, as Board.put_stone() without check_legal
+        """
+        games = np.flatnonzero(self.winner == EMPTY)
+        if len(games) == 0:
+            return
+        actions = np.asarray(actions, dtype=np.int64)[games]
+        color = self.next[games]
+        oppo = np.where(color == BLACK, WHITE, BLACK).astype(np.int8)
+        self.stones[games, actions] = color
+        self.counter_move[games] += 1
+
+        # Merge the new stone with adjacent self-groups: relabel them with the new stone's label
+        neighbor_points = NEIGHBORS[actions]  # (G, 4)
+        neighbor_labels = self.labels[games[:, None], neighbor_points]
+        is_self = self.stones[games[:, None], neighbor_points] == color[:, None]
+        merged_labels = np.where(is_self, neighbor_labels, -1)
+        new_label = actions + 1
+        relabel = (self.labels[games][:, :, None] == merged_labels[:, None, :]).any(axis=2)
+        labels = self.labels[games]
+        labels[relabel] = np.broadcast_to(new_label[:, None], labels.shape)[relabel]
+        labels[np.arange(len(games)), actions] = new_label
+        self.labels[games] = labels
+
+        self._update_liberties(games)
+
+        # Win by removing any opponent's group: an opponent's neighbor group without liberties
+        neighbor_libs = self.num_liberties[games[:, None], self.labels[games[:, None], neighbor_points]]
+        is_oppo = self.stones[games[:, None], neighbor_points] == oppo[:, None]
+        captured = (is_oppo & (neighbor_libs == 0)).any(axis=1)
+        self.winner[games[captured]] = color[captured]
+
+        # Next player
+        self.next[games] = oppo
+        self.legal_mask[games] = False
+        active = games[~captured]
+        if len(active) == 0:
+            return
+        legal = self._get_legal_mask(active)
+        self.legal_mask[active] = legal
+        no_legal = ~legal.any(axis=1)
+        self.winner[active[no_legal]] = np.where(self.next[active[no_legal]] == BLACK, WHITE, BLACK)
+        self.end_by_no_legal_actions[active[no_legal]] = True
+
+    def _update_liberties(self, games):
+        """Count the distinct liberties of every group label of the games."""
+        stones = self.stones[games]
+        labels = self.labels[games]
+        num_games = len(games)
+        empty = stones[:, :NUM_POINTS] == EMPTY
+        # All (game, label, empty point) adjacencies; distinct ones are liberties
+        game_idx, point_idx = np.nonzero(empty)
+        neighbor_labels = labels[game_idx[:, None], NEIGHBORS[point_idx]]  # (E, 4)
+        keys = ((game_idx[:, None] * (NUM_POINTS + 1) + neighbor_labels) * NUM_POINTS + point_idx[:, None])
+        keys = np.unique(keys[neighbor_labels > 0])
+        counts = np.bincount(keys // NUM_POINTS, minlength=num_games * (NUM_POINTS + 1))
+        self.num_liberties[games] = counts.reshape(num_games, NUM_POINTS + 1)
+
+    def _get_legal_mask(self, games):
+        """Legal actions of the player to move, with the same logic as Board._get_legal_actions()."""
+        stones = self.stones[games]
+        labels = self.labels[games]
+        libs = np.take_along_axis(self.num_liberties[games], labels, axis=1)  # Liberties of the group of each point
+        color = self.next[games][:, None, None]
+        oppo = np.where(color == BLACK, WHITE, BLACK)
+
+        neighbor_stones = stones[:, NEIGHBORS]  # (G, NUM_POINTS, 4)
+        neighbor_libs = libs[:, NEIGHBORS]
+        empty = stones[:, :NUM_POINTS] == EMPTY
+        is_self = neighbor_stones == color
+        is_oppo = neighbor_stones == oppo
+
+        endangered_lbt_opponent = empty & (is_oppo & (neighbor_libs == 1)).any(axis=2)
+        endangered_lbt_self = empty & (is_self & (neighbor_libs == 1)).any(axis=2)
+        liberties_opponent = empty & is_oppo.any(axis=2)
+
+        # If there are opponent's endangered points, return these points to win
+        has_win = endangered_lbt_opponent.any(axis=1)
+        # Else rescue self endangered points if any, else any opponent's liberty
+        has_self = endangered_lbt_self.any(axis=1)
+        candidates = np.where(has_self[:, None], endangered_lbt_self, liberties_opponent)
+        # No suicidal move: either has liberties or any connected self-group has more than this liberty
+        not_suicide = (neighbor_stones == EMPTY).any(axis=2) | (is_self & (neighbor_libs > 1)).any(axis=2)
+        return np.where(has_win[:, None], endangered_lbt_opponent, candidates & not_suicide)
+
+    def random_actions(self, rng=np.random):
+        """Draw a uniformly random legal action per game (0 for finished games)."""
+        scores = rng.random_sample(self.legal_mask.shape) if hasattr(rng, 'random_sample') \
+            else rng.random(self.legal_mask.shape)
+        return np.argmax(np.where(self.legal_mask, scores + 1, 0), axis=1)
@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+from game.go import BOARD_SIZE, get_geometry, intern_point, opponent_color, SYMMETRIES, ZOBRIST_STONE, \
+    ZOBRIST_WHITE_TO_MOVE, zobrist_next
+from operator import xor
+"""
+Array-backed alternative to game.go.Board.
+
+Points are encoded as flat integer indices (x * BOARD_SIZE + y) on boards of any size, and stones/liberties of
+every group are kept as Python int bitmasks, so that put_stone() and copy() only move a handful of ints and flat
+containers around.
+The external interface is the same as game.go.Board; read-only views of groups, libertydict and stonedict are
+built lazily for the evaluation functions and RL environments.
+"""
+
+NUM_POINTS = BOARD_SIZE * BOARD_SIZE
+POINTS = [intern_point((idx // BOARD_SIZE, idx % BOARD_SIZE)) for idx in range(NUM_POINTS)]  # index -> point
+INDEX = {point: idx for idx, point in enumerate(POINTS)
+         if 0 < point[0] < BOARD_SIZE and 0 < point[1] < BOARD_SIZE}  # point -> index (valid points only)
+
+
+_neighbor_tables = {}
+
+
+def neighbor_tables(size=BOARD_SIZE - 1):
+    """
+    Neighbor indices and neighbor masks of all point indices on a board with size rows/cols, built once per size.
+    :return: list of tuples of indices, list of bitmasks; both indexed by point index
+    """
+    tables = _neighbor_tables.get(size)
+    if tables is None:
+        neighbors = [()] * NUM_POINTS
+        for point, neighboring in get_geometry(size).neighbors.items():
+            neighbors[INDEX[point]] = tuple(INDEX[p] for p in neighboring)
+        tables = neighbors, [sum(1 << n for n in neighbors[idx]) for idx in range(NUM_POINTS)]
+        _neighbor_tables[size] = tables
+    return tables
+
+
+NEIGHBORS, NEIGHBOR_MASK = neighbor_tables()  # Tables of the default board
+# Same keys as game.go.Board, so both engines hash a position identically
+ZOBRIST_INDEX = {color: [ZOBRIST_STONE[color].get(point, 0) for point in POINTS] for color in ('BLACK', 'WHITE')}
+
+
+def iter_bits(mask):
+    """Yield the indices of all set bits, from low to high."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def mask_to_points(mask):
+    return [POINTS[idx] for idx in iter_bits(mask)]
+
+
+class BitGroup(object):
+    """Read-only snapshot of a group, exposing the same attributes as game.go.Group."""
+    __slots__ = ('color', 'stones', 'liberty_mask')
+
+    def __init__(self, color, stones, liberties):
+        """
+        :param color:
+        :param stones: bitmask of the stones
+        :param liberties: bitmask of the liberties
+        """
+        self.color = color
+        self.stones = stones
+        self.liberty_mask = liberties
+
+    @property
+    def points(self):
+        return mask_to_points(self.stones)
+
+    @property
+    def liberties(self):
+        return set(mask_to_points(self.liberty_mask))
+
+    @property
+    def num_liberty(self):
+        return popcount(self.liberty_mask)
+
+    def __str__(self):
+        """Summarize color, stones, liberties."""
+        return '%s - stones: [%s]; liberties: [%s]' % \
+               (self.color,
+                ', '.join([str(point) for point in self.points]),
+                ', '.join([str(point) for point in self.liberties]))
+
+    def __repr__(self):
+        return str(self)
+
+
+class _StoneView(object):
+    """Read-only stand-in for Board.stonedict."""
+    def __init__(self, board):
+        self.board = board
+
+    def get_groups(self, color, point):
+        idx = INDEX.get(point)
+        if idx is None or not self.board.stones[color] >> idx & 1:
+            return []
+        return [self.board.get_group(self.board.group_of[idx])]
+
+    def get_items(self, color):
+        return [(POINTS[idx], [self.board.get_group(self.board.group_of[idx])])
+                for idx in iter_bits(self.board.stones[color])]
+
+
+class _LibertyView(object):
+    """Read-only stand-in for Board.libertydict."""
+    def __init__(self, board):
+        self.board = board
+
+    def get_groups(self, color, point):
+        board = self.board
+        idx = INDEX.get(point)
+        if idx is None or (board.stones['BLACK'] | board.stones['WHITE']) >> idx & 1:
+            return []
+        groups = []
+        for gid in board.adjacent_groups(idx, color):
+            groups.append(board.get_group(gid))
+        return groups
+
+    def get_items(self, color):
+        board = self.board
+        items = {}
+        for gid in board.group_ids[color]:
+            group = board.get_group(gid)
+            for idx in iter_bits(group.liberty_mask):
+                items.setdefault(POINTS[idx], []).append(group)
+        return items.items()
+
+
+class BitBoard(object):
+    """
+    Drop-in replacement of game.go.Board backed by flat arrays and bitmasks.
+    group_of maps a point index to its group id (0 for empty); every group id has its color, stone mask and
+    liberty mask stored in flat dicts of ints, so copy() never touches group objects.
+    Same rules as game.go.Board: remove any opponent's group, or no legal actions for opponent, to win.
+    """
+    def __init__(self, next_color='BLACK', size=BOARD_SIZE - 1):
+        self.geometry = get_geometry(size)
+        self.neighbors, self.neighbor_mask = neighbor_tables(size)
+        self.winner = None
+        self.next = next_color
+        self.legal_actions = ()  # Legal actions for current state; a tuple, never mutated
+        self.end_by_no_legal_actions = False
+        self.counter_move = 0
+        self.zobrist_key = zobrist_next(next_color)
+        self.symmetry_keys = (0,) * len(SYMMETRIES)  # Same as game.go.Board.symmetry_keys
+
+        self.stones = {'BLACK': 0, 'WHITE': 0}  # {color: bitmask}
+        self.group_of = [0] * NUM_POINTS  # {point index: group id}
+        self.group_ids = {'BLACK': {}, 'WHITE': {}}  # {color: ordered set of group ids}
+        self.group_color = {}  # {group id: color}
+        self.group_stones = {}  # {group id: bitmask}
+        self.group_liberties = {}  # {group id: bitmask}
+        self.endangered_ids = {}  # ordered set of group ids with only 1 liberty
+        self.removed_ids = []  # This is assigned when game ends
+        self.next_gid = 1
+
+        self._views = {}  # Cached BitGroup snapshots and aggregates of the current state
+        self.undo_stack = []  # Snapshots of the states before the moves applied by play()
+
+    @property
+    def size(self):
+        """Number of rows/cols."""
+        return self.geometry.size
+
+    @property
+    def center(self):
+        """The point of the first move."""
+        return self.geometry.center
+
+    # ---------- Compatibility views ----------
+
+    def get_group(self, gid):
+        group = self._views.get(gid)
+        if group is None:
+            group = BitGroup(self.group_color[gid], self.group_stones[gid], self.group_liberties[gid])
+            self._views[gid] = group
+        return group
+
+    @property
+    def groups(self):
+        return {color: [self.get_group(gid) for gid in self.group_ids[color]] for color in ('BLACK', 'WHITE')}
+
+    @property
+    def endangered_groups(self):
+        return [self.get_group(gid) for gid in self.endangered_ids]
+
+    @property
+    def removed_groups(self):
+        return [self.get_group(gid) for gid in self.removed_ids]
+
+    @property
+    def libertydict(self):
+        return _LibertyView(self)
+
+    def _aggregates(self, color):
+        """
+        Aggregates for evaluation of the color, as maintained by Board; computed from the masks and cached until the
+        next move: ({number of liberties: number of groups}, liberty sum, number of liberty points, dangerous liberties)
+        """
+        key = ('aggregates', color)
+        aggregates = self._views.get(key)
+        if aggregates is None:
+            counts = {}
+            liberty_sum = 0
+            once = twice = more = 0  # Liberties of exactly one, exactly two, more than two groups
+            once2 = twice2 = more2 = 0  # Same, over the groups with two liberties
+            for gid in self.group_ids[color]:
+                liberties = self.group_liberties[gid]
+                num_liberty = popcount(liberties)
+                counts[num_liberty] = counts.get(num_liberty, 0) + 1
+                liberty_sum += num_liberty
+                more |= twice & liberties
+                twice = (twice | (once & liberties)) & ~more
+                once = (once | liberties) & ~twice & ~more
+                if num_liberty == 2:
+                    more2 |= twice2 & liberties
+                    twice2 = (twice2 | (once2 & liberties)) & ~more2
+                    once2 = (once2 | liberties) & ~twice2 & ~more2
+            aggregates = (counts, liberty_sum, popcount(once | twice | more), set(mask_to_points(twice & twice2)))
+            self._views[key] = aggregates
+        return aggregates
+
+    @property
+    def num_groups_by_liberty(self):
+        return {color: self._aggregates(color)[0] for color in ('BLACK', 'WHITE')}
+
+    @property
+    def liberty_sum(self):
+        return {color: self._aggregates(color)[1] for color in ('BLACK', 'WHITE')}
+
+    @property
+    def num_liberty_points(self):
+        return {color: self._aggregates(color)[2] for color in ('BLACK', 'WHITE')}
+
+    @property
+    def dangerous_liberties(self):
+        return {color: self._aggregates(color)[3] for color in ('BLACK', 'WHITE')}
+
+    @property
+    def stonedict(self):
+        return _StoneView(self)
+
+    # ---------- Internal game logic ----------
+
+    def adjacent_groups(self, idx, color):
+        """Return ids of the groups of color adjacent to the point index, without duplicates."""
+        gids = []
+        stones = self.stones[color]
+        for n in self.neighbors[idx]:
+            if stones >> n & 1:
+                gid = self.group_of[n]
+                if gid not in gids:
+                    gids.append(gid)
+        return gids
+
+    def _remove_group_id(self, gid):
+        del self.group_ids[self.group_color[gid]][gid]
+        del self.group_color[gid]
+        del self.group_stones[gid]
+        del self.group_liberties[gid]
+        self.endangered_ids.pop(gid, None)
+
+    def get_legal_actions(self):
+        """External interface to get legal actions, as a read-only tuple (not to be copied)"""
+        return self.legal_actions
+
+    def _get_legal_actions(self):
+        """Internal method to calculate legal actions; shouldn't be called outside"""
+        if self.winner:
+            return ()
+
+        endangered_lbt_self = 0
+        endangered_lbt_opponent = 0
+        for gid in self.endangered_ids:
+            if self.group_color[gid] == self.next:
+                endangered_lbt_self |= self.group_liberties[gid]
+            else:
+                endangered_lbt_opponent |= self.group_liberties[gid]
+
+        # If there are opponent's endangered points, return these points to win
+        if endangered_lbt_opponent:
+            return tuple(mask_to_points(endangered_lbt_opponent))
+
+        if endangered_lbt_self:
+            # Rescue the endangered liberties (losing the game if more than one)
+            candidates = endangered_lbt_self
+        else:
+            candidates = 0
+            for gid in self.group_ids[opponent_color(self.next)]:
+                candidates |= self.group_liberties[gid]
+
+        # Final check: no suicidal move, either has liberties or any connected self-group has more than this liberty
+        occupied = self.stones['BLACK'] | self.stones['WHITE']
+        self_stones = self.stones[self.next]
+        legal_actions = []
+        neighbors, neighbor_mask = self.neighbors, self.neighbor_mask
+        for idx in iter_bits(candidates):
+            if neighbor_mask[idx] & ~occupied:
+                legal_actions.append(POINTS[idx])
+                continue
+            for n in neighbors[idx]:
+                if self_stones >> n & 1:
+                    libs = self.group_liberties[self.group_of[n]]
+                    if libs & (libs - 1):  # More than one liberty
+                        legal_actions.append(POINTS[idx])
+                        break
+        return tuple(legal_actions)
+
+    def put_stone(self, point, check_legal=False):
+        if check_legal:
+            if point not in self.legal_actions:
+                print('Error: illegal move, try again.')
+                return False
+        # If more than 400 moves (which shouldn't happen), print the board for debug
+        if self.counter_move > 400:
+            print(self)
+            raise RuntimeError('More than 400 moves in one game! Board is printed.')
+
+        self._views = {}
+        idx = INDEX[point]
+        bit = 1 << idx
+        color = self.next
+        opponent = opponent_color(color)
+        self_gids = self.adjacent_groups(idx, color)
+        self.zobrist_key ^= ZOBRIST_INDEX[color][idx] ^ ZOBRIST_WHITE_TO_MOVE
+        self.symmetry_keys = tuple(map(xor, self.symmetry_keys, self.geometry.symmetry_zobrist[color][point]))
+
+        # Remove the liberty from opponent's groups first; check winning or endangered groups
+        for gid in self.adjacent_groups(idx, opponent):
+            libs = self.group_liberties[gid] & ~bit
+            self.group_liberties[gid] = libs
+            if not libs:
+                self.removed_ids.append(gid)
+                self.winner = color
+            elif not libs & (libs - 1):
+                self.endangered_ids[gid] = None
+        self.counter_move += 1
+        if self.winner:
+            self.next = opponent
+            self.legal_actions = ()
+            return True
+
+        # Merge all self-groups in touch with the new stone, or create a new group
+        self.stones[color] |= bit
+        occupied = self.stones['BLACK'] | self.stones['WHITE']
+        liberties = self.neighbor_mask[idx] & ~occupied
+        if self_gids:
+            gid = self_gids[0]
+            stones = self.group_stones[gid] | bit
+            liberties |= self.group_liberties[gid]
+            for other in self_gids[1:]:
+                other_stones = self.group_stones[other]
+                for s in iter_bits(other_stones):
+                    self.group_of[s] = gid
+                stones |= other_stones
+                liberties |= self.group_liberties[other]
+                self._remove_group_id(other)
+            liberties &= ~bit
+        else:
+            gid = self.next_gid
+            self.next_gid += 1
+            stones = bit
+            self.group_ids[color][gid] = None
+            self.group_color[gid] = color
+        self.group_of[idx] = gid
+        self.group_stones[gid] = stones
+        self.group_liberties[gid] = liberties
+
+        # Update whether is endangered group
+        if liberties and not liberties & (liberties - 1):
+            self.endangered_ids[gid] = None
+        else:
+            self.endangered_ids.pop(gid, None)
+
+        self.next = opponent
+
+        # Update legal_actions; if there are no legal actions for opponent, claim winning
+        self.legal_actions = self._get_legal_actions()
+        if not self.legal_actions:
+            self.winner = color
+            self.end_by_no_legal_actions = True
+
+        return True
+
+    def generate_successor_state(self, action, check_legal=False):
+        board = self.copy()
+        board.put_stone(action, check_legal=check_legal)
+        return board
+
+    def play(self, action):
+        """Apply the action in place; the previous state is kept as a flat copy, which is already cheap here."""
+        self.undo_stack.append(self.copy())
+        self.put_stone(action, check_legal=False)
+
+    def undo(self):
+        """Revert the last action applied by play()."""
+        undo_stack = self.undo_stack
+        self.__dict__.update(undo_stack.pop().__dict__)
+        self.undo_stack = undo_stack
+
+    def __str__(self):
+        groups = self.groups
+        str_groups = [str(group) for group in groups['BLACK']] + [str(group) for group in groups['WHITE']]
+        return 'Next: %s\n%s' % (self.next, '\n'.join(str_groups))
+
+    def exist_stone(self, point):
+        """To see if a stone has been placed on the board"""
+        idx = INDEX.get(point)
+        return idx is not None and bool((self.stones['BLACK'] | self.stones['WHITE']) >> idx & 1)
+
+    def to_compact(self):
+        """
+        Return a compact picklable form of the board:
+        (next, counter_move, winner, BLACK stones, WHITE stones, size).
+        """
+        return self.next, self.counter_move, self.winner, \
+            tuple(mask_to_points(self.stones['BLACK'])), tuple(mask_to_points(self.stones['WHITE'])), self.size
+
+    @classmethod
+    def from_compact(cls, compact):
+        """Rebuild a board from to_compact(); groups, liberties and legal actions are derived from the stones."""
+        next_color, counter_move, winner, black, white, size = compact
+        board = cls(next_color, size)
+        board.counter_move = counter_move
+        for color, points in (('BLACK', black), ('WHITE', white)):
+            for point in points:
+                board.stones[color] |= 1 << INDEX[point]
+                board.zobrist_key ^= ZOBRIST_INDEX[color][INDEX[point]]
+                images = board.geometry.symmetry_zobrist[color][point]
+                board.symmetry_keys = tuple(map(xor, board.symmetry_keys, images))
+        occupied = board.stones['BLACK'] | board.stones['WHITE']
+        for color in ('BLACK', 'WHITE'):
+            unvisited = board.stones[color]
+            while unvisited:
+                # Flood fill the group of the lowest unvisited stone
+                stones = unvisited & -unvisited
+                frontier = stones
+                while frontier:
+                    grown = 0
+                    for idx in iter_bits(frontier):
+                        grown |= board.neighbor_mask[idx]
+                    frontier = grown & unvisited & ~stones
+                    stones |= frontier
+                unvisited &= ~stones
+                liberties = 0
+                gid = board.next_gid
+                board.next_gid += 1
+                for idx in iter_bits(stones):
+                    board.group_of[idx] = gid
+                    liberties |= board.neighbor_mask[idx]
+                liberties &= ~occupied
+                board.group_ids[color][gid] = None
+                board.group_color[gid] = color
+                board.group_stones[gid] = stones
+                board.group_liberties[gid] = liberties
+                if liberties and not liberties & (liberties - 1):
+                    board.endangered_ids[gid] = None
+        board.winner = winner
+        if not winner:
+            board.legal_actions = board._get_legal_actions()
+            if not board.legal_actions:
+                board.winner = opponent_color(next_color)
+                board.end_by_no_legal_actions = True
+        return board
+
+    def copy(self):
+        """Flat copy; all group data are ints so nothing is deep-copied"""
+        board = BitBoard.__new__(BitBoard)
+        board.geometry = self.geometry
+        board.neighbors = self.neighbors
+        board.neighbor_mask = self.neighbor_mask
+        board.winner = self.winner
+        board.next = self.next
+        board.legal_actions = self.legal_actions  # Never mutated in place
+        board.end_by_no_legal_actions = self.end_by_no_legal_actions
+        board.counter_move = self.counter_move
+        board.zobrist_key = self.zobrist_key
+        board.symmetry_keys = self.symmetry_keys
+        board.stones = self.stones.copy()
+        board.group_of = self.group_of[:]
+        board.group_ids = {'BLACK': self.group_ids['BLACK'].copy(), 'WHITE': self.group_ids['WHITE'].copy()}
+        board.group_color = self.group_color.copy()
+        board.group_stones = self.group_stones.copy()
+        board.group_liberties = self.group_liberties.copy()
+        board.endangered_ids = self.endangered_ids.copy()
+        board.removed_ids = self.removed_ids.copy()
+        board.next_gid = self.next_gid
+        board._views = {}
+        board.undo_stack = []
+        return board
@@ -1,11 +1,32 @@
 #!/usr/bin/env python
 from copy import deepcopy
-from game.util import PointDict
+from game.util import PointDict, GroupSet
+from operator import xor
+import itertools
+import random
 """
 This file is the full backend environment of the game.
 """
 
-BOARD_SIZE = 20  # number of rows/cols = BOARD_SIZE - 1
+BOARD_SIZE = 20  # number of rows/cols = BOARD_SIZE - 1, on the default board and the largest supported board
+BOARD_SIZES = (9, 13, 19)  # Supported numbers of rows/cols
+
+# Zobrist keys: one random 64-bit key per (color, point), plus one for WHITE to move; fixed seed for reproducibility
+_zobrist_random = random.Random(20)
+ZOBRIST_STONE = {color: {(x, y): _zobrist_random.getrandbits(64)
+                         for x in range(1, BOARD_SIZE) for y in range(1, BOARD_SIZE)}
+                 for color in ('BLACK', 'WHITE')}
+ZOBRIST_WHITE_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def zobrist_next(color):
+    return ZOBRIST_WHITE_TO_MOVE if color == 'WHITE' else 0
+
+
+# Operations recorded in a move delta by play(); each is undone by its inverse in undo()
+_POP, _INSERT, _SET_ADD, _TRUNCATE, _SET_BUCKET, _SET_LIBERTIES, _SET_ITEM, _SET_DISCARD, _DEL_ITEM = range(9)
+
+_group_ids = itertools.count(1)  # Ids of new groups, unique across all boards
 
 
 def opponent_color(color):
@@ -18,30 +39,88 @@ def opponent_color(color):
         return KeyError
 
 
-def neighbors(point):
-    """Return a list of neighboring points."""
-    neighboring = [(point[0] - 1, point[1]),
-                   (point[0] + 1, point[1]),
-                   (point[0], point[1] - 1),
-                   (point[0], point[1] + 1)]
-    return [point for point in neighboring if 0 < point[0] < BOARD_SIZE and 0 < point[1] < BOARD_SIZE]
+# Interned points: every point held by a board is one of these tuples, shared by all boards of all sizes
+POINTS = {(x, y): (x, y) for x in range(1, BOARD_SIZE) for y in range(1, BOARD_SIZE)}
+
+
+def intern_point(point):
+    """Return the interned tuple of the point (the point itself if off board)."""
+    return POINTS.get(point, point)
+
+
+# The 8 symmetries of the square board (rotations and reflections), as maps of (x, y) with m = number of rows/cols + 1
+SYMMETRIES = (
+    lambda x, y, m: (x, y),  # Identity
+    lambda x, y, m: (y, m - x),  # Rotation by 90 degrees
+    lambda x, y, m: (m - x, m - y),  # Rotation by 180 degrees
+    lambda x, y, m: (m - y, x),  # Rotation by 270 degrees
+    lambda x, y, m: (m - x, y),  # Reflection across the vertical axis
+    lambda x, y, m: (x, m - y),  # Reflection across the horizontal axis
+    lambda x, y, m: (y, x),  # Reflection across the diagonal
+    lambda x, y, m: (m - y, m - x),  # Reflection across the anti-diagonal
+)
+SYMMETRY_INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)  # Index of the inverse of each symmetry
+
+
+class Geometry(object):
+    """Points of a board with size rows/cols (points are (x, y) from 1 to size), and their precomputed neighbors."""
+    def __init__(self, size):
+        self.size = size
+        self.points = [POINTS[(x, y)] for x in range(1, size + 1) for y in range(1, size + 1)]
+        self.center = POINTS[((size + 1) // 2, (size + 1) // 2)]
+        self.neighbors = {}  # {point: tuple of neighboring points}
+        for point in self.points:
+            x, y = point
+            neighboring = [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]
+            self.neighbors[point] = tuple(POINTS[p] for p in neighboring if 0 < p[0] <= size and 0 < p[1] <= size)
+        # symmetries[k][point] is the image of the point by SYMMETRIES[k]
+        self.symmetries = [{point: POINTS[symmetry(point[0], point[1], size + 1)] for point in self.points}
+                           for symmetry in SYMMETRIES]
+        # {color: {point: Zobrist keys of the stone on the 8 images of the point}}, for Board.symmetry_keys
+        self.symmetry_zobrist = {color: {point: tuple(ZOBRIST_STONE[color][images[point]]
+                                                      for images in self.symmetries)
+                                         for point in self.points}
+                                 for color in ('BLACK', 'WHITE')}
+
+
+_geometries = {}
+
+
+def get_geometry(size=BOARD_SIZE - 1):
+    """Return the Geometry of the board size, built once per size."""
+    geometry = _geometries.get(size)
+    if geometry is None:
+        if size not in BOARD_SIZES:
+            raise ValueError('Unsupported board size: %s; possible sizes: %s' % (size, BOARD_SIZES))
+        geometry = Geometry(size)
+        _geometries[size] = geometry
+    return geometry
+
+
+def neighbors(point, size=BOARD_SIZE - 1):
+    """Return a tuple of neighboring points, from the precomputed table."""
+    return get_geometry(size).neighbors[point]
 
 
 def cal_liberty(points, board):
     """Find and return the liberties of the point."""
-    liberties = [point for point in neighbors(points)
+    liberties = [point for point in board.geometry.neighbors[points]
                  if not board.stonedict.get_groups('BLACK', point) and not board.stonedict.get_groups('WHITE', point)]
     return set(liberties)
 
 
 class Group(object):
-    def __init__(self, point, color, liberties):
+    __slots__ = ('gid', 'color', 'points', 'liberties')
+
+    def __init__(self, point, color, liberties, gid=None):
         """
         Create and initialize a new group.
         :param point: the initial stone in the group
         :param color:
         :param liberties:
+        :param gid: the id of the group; a new id if None, the id of the original for a clone
         """
+        self.gid = next(_group_ids) if gid is None else gid
         self.color = color
         if isinstance(point, list):
             self.points = point
@@ -77,38 +156,224 @@ class Board(object):
     put_stone() is the main internal method that contains all logic to update game state.
     create_group(), remove_group(), merge_groups() operations don't check winner or endangered groups.
     Winner or endangered groups are updated in put_stone().
+    play() and undo() apply and revert a move in place, for search that doesn't copy boards.
+    copy() is copy-on-write: groups and PointDict buckets are shared with the copy until either board mutates them,
+    so every mutation of a bucket or a group goes through _bucket() or _writable_group() first.
+    zobrist_key is the 64-bit position hash (stones per color and the side to move), updated in put_stone().
+    symmetry_keys are the stone hashes of the 8 symmetric images of the position, see game.symmetry.
+    Aggregates for evaluation are updated along with groups and libertydict (see _count_group(), _add_liberty_group()):
+    num_groups_by_liberty, liberty_sum, num_liberty_points and dangerous_liberties.
+    Legal actions are derived from sets maintained the same way (liberty_points, enclosed), see _get_legal_actions().
+    groups[color] and endangered_groups are GroupSets indexed by group id; merge_groups() relabels the smaller groups.
     Winning criteria: remove any opponent's group, or no legal actions for opponent.
     """
-    def __init__(self, next_color='BLACK'):
+    def __init__(self, next_color='BLACK', size=BOARD_SIZE - 1):
+        """
+        :param next_color:
+        :param size: number of rows/cols, one of BOARD_SIZES
+        """
+        self.geometry = get_geometry(size)  # Shared by all boards of the same size
         self.winner = None
         self.next = next_color
-        self.legal_actions = []  # Legal actions for current state
+        self.legal_actions = ()  # Legal actions for current state; a tuple, never mutated
         self.end_by_no_legal_actions = False
         self.counter_move = 0
+        self.zobrist_key = zobrist_next(next_color)
+        self.symmetry_keys = (0,) * len(SYMMETRIES)  # Stones only; zobrist_key == symmetry_keys[0] ^ zobrist_next()
 
         # Point dict
         self.libertydict = PointDict()  # {color: {point: {groups}}}
         self.stonedict = PointDict()
 
         # Group list
-        self.groups = {'BLACK': [], 'WHITE': []}
-        self.endangered_groups = []  # groups with only 1 liberty
+        self.groups = {'BLACK': GroupSet(), 'WHITE': GroupSet()}
+        self.endangered_groups = GroupSet()  # groups with only 1 liberty
         self.removed_groups = []  # This is assigned when game ends
-                
+
+        # Aggregates for evaluation
+        self.num_groups_by_liberty = {'BLACK': {}, 'WHITE': {}}  # {color: {number of liberties: number of groups}}
+        self.liberty_sum = {'BLACK': 0, 'WHITE': 0}  # Sum of the number of liberties of all groups
+        self.liberty_points = {'BLACK': set(), 'WHITE': set()}  # Distinct liberties of all groups
+        self.dangerous_liberties = {'BLACK': set(), 'WHITE': set()}  # Liberties shared by exactly two 2-liberty groups
+        self._touched = set()  # Points whose dangerous status may have changed in put_stone()
+        self.enclosed = set()  # Empty points without empty neighbors
+
+        # Make/unmake
+        self.undo_stack = []  # Deltas of the moves applied by play()
+        self._delta = None  # Delta being recorded by play(); None if not recording
+
+        # Copy-on-write
+        self._owned = set()  # ids of buckets and groups not shared with any other board
+
+    @property
+    def size(self):
+        """Number of rows/cols."""
+        return self.geometry.size
+
+    @property
+    def center(self):
+        """The point of the first move."""
+        return self.geometry.center
+
+    def _bucket(self, pointdict, color, point):
+        """Return the bucket of the point for mutation, cloned first if it might be shared with another board."""
+        bucket = pointdict.d[color].get(point)
+        if bucket is None or id(bucket) not in self._owned:
+            if self._delta is not None:
+                self._delta.append((_SET_BUCKET, pointdict, color, point, bucket))
+            bucket = [] if bucket is None else bucket.copy()
+            pointdict.set_groups(color, point, bucket)
+            self._owned.add(id(bucket))
+        return bucket
+
+    def _writable_group(self, group):
+        """Return the group for mutation; a shared group is cloned and replaced in all lists and buckets."""
+        if id(group) in self._owned:
+            return group
+        color = group.color
+        clone = Group(group.points.copy(), color, group.liberties.copy(), group.gid)
+        self._owned.add(id(clone))
+        self._group_set(self.groups[color], clone)
+        if group in self.endangered_groups:
+            self._group_set(self.endangered_groups, clone)
+        self._set_stone_buckets(color, clone.points, [clone])
+        for liberty in group.liberties:
+            self._list_replace(self._bucket(self.libertydict, color, liberty), group, clone)
+        return clone
+
+    def _set_stone_buckets(self, color, points, bucket):
+        """Set the stonedict bucket of the points; all stones of a group share one bucket [group], never mutated."""
+        stones = self.stonedict.d[color]
+        for point in points:
+            if self._delta is not None:
+                self._delta.append((_SET_BUCKET, self.stonedict, color, point, stones.get(point)))
+            stones[point] = bucket
+
+    def _list_replace(self, lst, item, new_item):
+        idx = lst.index(item)
+        lst[idx] = new_item
+        if self._delta is not None:
+            self._delta.append((_SET_ITEM, lst, idx, item))
+
+    def _list_append(self, lst, item):
+        lst.append(item)
+        if self._delta is not None:
+            self._delta.append((_POP, lst))
+
+    def _list_remove(self, lst, item):
+        idx = lst.index(item)
+        del lst[idx]
+        if self._delta is not None:
+            self._delta.append((_INSERT, lst, idx, item))
+
+    def _group_set(self, groups, group):
+        """Add the group to the GroupSet, or replace the group of the same gid."""
+        if self._delta is not None:
+            old_group = groups.d.get(group.gid)
+            if old_group is None:
+                self._delta.append((_DEL_ITEM, groups.d, group.gid))
+            else:
+                self._delta.append((_SET_ITEM, groups.d, group.gid, old_group))
+        groups.d[group.gid] = group
+
+    def _group_remove(self, groups, group):
+        del groups.d[group.gid]
+        if self._delta is not None:
+            self._delta.append((_SET_ITEM, groups.d, group.gid, group))
+
+    def _add_count(self, counts, key, diff):
+        value = counts.get(key, 0)
+        if self._delta is not None:
+            self._delta.append((_SET_ITEM, counts, key, value))
+        counts[key] = value + diff
+
+    def _set_add(self, items, item):
+        items.add(item)
+        if self._delta is not None:
+            self._delta.append((_SET_DISCARD, items, item))
+
+    def _set_discard(self, items, item):
+        items.remove(item)
+        if self._delta is not None:
+            self._delta.append((_SET_ADD, items, item))
+
+    @property
+    def num_liberty_points(self):
+        """Number of distinct liberties of all groups, per color."""
+        return {'BLACK': len(self.liberty_points['BLACK']), 'WHITE': len(self.liberty_points['WHITE'])}
+
+    def _count_group(self, color, num_liberty, diff):
+        """Add (diff=1) or remove (diff=-1) a group with num_liberty liberties in the aggregates."""
+        self._add_count(self.num_groups_by_liberty[color], num_liberty, diff)
+        self._add_count(self.liberty_sum, color, diff * num_liberty)
+
+    def _add_liberty_group(self, color, point, group):
+        """Add the group to the libertydict bucket of the point."""
+        bucket = self._bucket(self.libertydict, color, point)
+        self._list_append(bucket, group)
+        if len(bucket) == 1:
+            self._set_add(self.liberty_points[color], point)
+        self._touched.add(point)
+
+    def _remove_liberty_group(self, color, point, group):
+        """Remove the group from the libertydict bucket of the point."""
+        bucket = self._bucket(self.libertydict, color, point)
+        self._list_remove(bucket, group)
+        if not bucket:
+            self._set_discard(self.liberty_points[color], point)
+            if self._delta is not None:
+                self._delta.append((_SET_BUCKET, self.libertydict, color, point, bucket))
+            self.libertydict.remove_point(color, point)  # No empty buckets are kept
+        self._touched.add(point)
+
+    def _is_dangerous_liberty(self, color, point):
+        groups = self.libertydict.d[color].get(point, ())
+        return len(groups) == 2 and groups[0].num_liberty == 2 and groups[1].num_liberty == 2
+
+    def _update_dangerous_liberties(self):
+        """Update dangerous_liberties on the points touched since the last update."""
+        for color in ('BLACK', 'WHITE'):
+            dangerous = self.dangerous_liberties[color]
+            for point in self._touched:
+                is_dangerous = self._is_dangerous_liberty(color, point)
+                if is_dangerous and point not in dangerous:
+                    self._set_add(dangerous, point)
+                elif not is_dangerous and point in dangerous:
+                    self._set_discard(dangerous, point)
+        self._touched = set()
+
+    def _compute_aggregates(self):
+        """Compute all aggregates and liberty_points from scratch, from groups and libertydict; and enclosed."""
+        for color in ('BLACK', 'WHITE'):
+            counts = {}
+            for group in self.groups[color]:
+                counts[group.num_liberty] = counts.get(group.num_liberty, 0) + 1
+            self.num_groups_by_liberty[color] = counts
+            self.liberty_sum[color] = sum(group.num_liberty for group in self.groups[color])
+            points = [point for point, groups in self.libertydict.get_items(color) if groups]
+            self.liberty_points[color] = set(points)
+            self.dangerous_liberties[color] = {point for point in points if self._is_dangerous_liberty(color, point)}
+        self._touched = set()
+        table = self.geometry.neighbors
+        self.enclosed = {point for point in self.geometry.points
+                         if self._is_empty(point) and not any(self._is_empty(n) for n in table[point])}
+
     def create_group(self, point, color):
         """Create a new group."""
         # Update group list
         ll = cal_liberty(point, self)
         group = Group(point, color, ll)
-        self.groups[color].append(group)
+        self._owned.add(id(group))
+        self._group_set(self.groups[color], group)
         # Update endangered group
         if len(group.liberties) <= 1:
-            self.endangered_groups.append(group)
+            self._group_set(self.endangered_groups, group)
         # Update stonedict
-        self.stonedict.get_groups(color, point).append(group)
+        self._set_stone_buckets(color, [point], [group])
         # Update libertydict
         for liberty in group.liberties:
-            self.libertydict.get_groups(color, liberty).append(group)
+            self._add_liberty_group(color, liberty, group)
+        self._count_group(color, group.num_liberty, 1)
         return group
       
     def remove_group(self, group):
@@ -119,62 +384,87 @@ class Board(object):
         """
         color = group.color
         # Update group list
-        self.groups[color].remove(group)
+        self._group_remove(self.groups[color], group)
         # Update endangered_groups
         if group in self.endangered_groups:
-            self.endangered_groups.remove(group)
+            self._group_remove(self.endangered_groups, group)
         # Update stonedict
         for point in group.points:
-            self.stonedict.get_groups(color, point).remove(group)
+            if self._delta is not None:
+                self._delta.append((_SET_BUCKET, self.stonedict, color, point, self.stonedict.d[color][point]))
+            self.stonedict.remove_point(color, point)
         # Update libertydict
         for liberty in group.liberties:
-            self.libertydict.get_groups(color, liberty).remove(group)
+            self._remove_liberty_group(color, liberty, group)
+        self._count_group(color, group.num_liberty, -1)
 
     def merge_groups(self, grouplist, point):
         """
-        Merge groups (assuming same color).
+        Merge groups (assuming same color), union by size: the largest group absorbs the others,
+        so only the stones and liberties of the smaller groups are relabeled.
+        All groups must be writable (see _writable_group());
         all groups already have this liberty removed;
         libertydict already has this point removed.
         :param grouplist:
         :param point:
         """
         color = grouplist[0].color
-        newgroup = grouplist[0]
-        all_liberties = grouplist[0].liberties
+        newgroup = max(grouplist, key=lambda group: len(group.points))
+        point_liberties = cal_liberty(point, self)
+        all_liberties = newgroup.liberties | point_liberties
+        self._count_group(color, newgroup.num_liberty, -1)
 
         # Add last move (update newgroup and stonedict)
+        if self._delta is not None:
+            self._delta.append((_TRUNCATE, newgroup.points, len(newgroup.points)))
+            self._delta.append((_SET_LIBERTIES, newgroup, newgroup.liberties))
         newgroup.add_stones([point])
-        self.stonedict.get_groups(color, point).append(newgroup)
-        all_liberties = all_liberties | cal_liberty(point, self)
+        stone_bucket = self.stonedict.d[color][newgroup.points[0]]  # Shared by all stones of newgroup
+        self._set_stone_buckets(color, [point], stone_bucket)
 
-        # Merge with other groups (update newgroup and stonedict)
-        for group in grouplist[1:]:
+        # Absorb other groups (relabel their stones and liberties to newgroup)
+        for group in grouplist:
+            if group is newgroup:
+                continue
             newgroup.add_stones(group.points)
-            for p in group.points:
-                self.stonedict.get_groups(color, p).append(newgroup)
+            self._set_stone_buckets(color, group.points, stone_bucket)
+            for liberty in group.liberties:
+                bucket = self._bucket(self.libertydict, color, liberty)
+                if newgroup in bucket:
+                    self._remove_liberty_group(color, liberty, group)
+                else:
+                    self._list_replace(bucket, group, newgroup)
             all_liberties = all_liberties | group.liberties
-            self.remove_group(group)
+            self._group_remove(self.groups[color], group)
+            if group in self.endangered_groups:
+                self._group_remove(self.endangered_groups, group)
+            self._count_group(color, group.num_liberty, -1)
 
         # Update newgroup liberties (point is already removed from group liberty)
         newgroup.liberties = all_liberties
+        self._count_group(color, newgroup.num_liberty, 1)
+        self._touched.update(all_liberties)
 
-        # Update libertydict
-        for point in all_liberties:
-            belonging_groups = self.libertydict.get_groups(color, point)
-            if newgroup not in belonging_groups:
-                belonging_groups.append(newgroup)
+        # Update libertydict with the liberties of the new stone
+        for liberty in point_liberties:
+            if newgroup not in self.libertydict.get_groups(color, liberty):
+                self._add_liberty_group(color, liberty, newgroup)
 
         return newgroup
 
     def get_legal_actions(self):
-        """External interface to get legal actions"""
+        """External interface to get legal actions, as a read-only tuple (not to be copied)"""
         # It is important NOT to calculate actions on the fly to keep the performance.
-        return self.legal_actions.copy()
+        return self.legal_actions
 
     def _get_legal_actions(self):
-        """Internal method to calculate legal actions; shouldn't be called outside"""
+        """
+        Internal method to calculate legal actions; shouldn't be called outside.
+        The candidates are read from the incrementally maintained liberty_points; only enclosed candidates
+        (without empty neighbors) can be suicidal, so only these are checked.
+        """
         if self.winner:
-            return []
+            return ()
 
         endangered_lbt_self = set()
         endangered_lbt_opponent = set()
@@ -186,45 +476,66 @@ class Board(object):
 
         # If there are opponent's endangered points, return these points to win
         if len(endangered_lbt_opponent) > 0:
-            return list(endangered_lbt_opponent)
+            return tuple(endangered_lbt_opponent)
 
-        legal_actions = []
+        # Rescue self endangered points if any (losing the game if more than one), else any opponent's liberty
         if len(endangered_lbt_self) > 0:
-            # If there are more than one self endangered points, return these points (losing the game)
-            if len(endangered_lbt_self) > 1:
-                legal_actions = list(endangered_lbt_self)
-            # Rescue the sole endangered liberty if existing
-            if len(endangered_lbt_self) == 1:
-                legal_actions = list(endangered_lbt_self)
+            candidates = endangered_lbt_self
         else:
-            legal_actions = set()
-            for group in self.groups[opponent_color(self.next)]:
-                legal_actions = legal_actions | group.liberties
-            legal_actions = list(legal_actions)
+            candidates = self.liberty_points[opponent_color(self.next)]
 
         # Final check: no suicidal move, either has liberties or any connected self-group has more than this liberty
-        legal_actions_filtered = []
-        for action in legal_actions:
-            if len(cal_liberty(action, self)) > 0:
-                legal_actions_filtered.append(action)
+        self_stones = self.stonedict.d[self.next]
+        suicidal = []
+        for action in self.enclosed & candidates:
+            for p in self.geometry.neighbors[action]:
+                self_groups = self_stones.get(p)
+                if self_groups and self_groups[0].num_liberty > 1:
+                    break
             else:
-                connected_self_groups = [self.stonedict.get_groups(self.next, p)[0] for p in neighbors(action)
-                                         if self.stonedict.get_groups(self.next, p)]
-                for self_group in connected_self_groups:
-                    if len(self_group.liberties) > 1:
-                        legal_actions_filtered.append(action)
-                        break
-
-        return legal_actions_filtered
+                suicidal.append(action)
+        if suicidal:
+            return tuple(action for action in candidates if action not in suicidal)
+        return tuple(candidates)
+
+    def _is_empty(self, point):
+        return not self.stonedict.d['BLACK'].get(point) and not self.stonedict.d['WHITE'].get(point)
+
+    def _update_enclosed(self, point):
+        """Update enclosed after a stone is put on the point: only the point and its neighbors can change."""
+        if point in self.enclosed:
+            self._set_discard(self.enclosed, point)
+        table = self.geometry.neighbors
+        for n in table[point]:
+            if n not in self.enclosed and self._is_empty(n) and not any(self._is_empty(nn) for nn in table[n]):
+                self._set_add(self.enclosed, n)
 
     def _shorten_liberty(self, group, point, color):
+        """Return the group, which is cloned if it was shared (see _writable_group())."""
+        group = self._writable_group(group)
         group.remove_liberty(point)
+        if self._delta is not None:
+            self._delta.append((_SET_ADD, group.liberties, point))
+        counts = self.num_groups_by_liberty[group.color]
+        self._add_count(counts, group.num_liberty + 1, -1)
+        self._add_count(counts, group.num_liberty, 1)
+        self._add_count(self.liberty_sum, group.color, -1)
+        self._touched.update(group.liberties)
         if group.color != color:  # If opponent's group, check if winning or endangered groups
             if len(group.liberties) == 0:  # The new stone is opponent's, check if winning
-                self.removed_groups.append(group)  # Set removed_group
+                self._list_append(self.removed_groups, group)  # Set removed_group
                 self.winner = opponent_color(group.color)
             elif len(group.liberties) == 1:
-                self.endangered_groups.append(group)
+                self._group_set(self.endangered_groups, group)
+        return group
+
+    def _remove_liberty_point(self, color, point):
+        if self._delta is not None:
+            self._delta.append((_SET_BUCKET, self.libertydict, color, point, self.libertydict.d[color].get(point)))
+        if self.libertydict.get_groups(color, point):
+            self._set_discard(self.liberty_points[color], point)
+        self.libertydict.remove_point(color, point)
+        self._touched.add(point)
 
     def shorten_liberty_for_groups(self, point, color):
         """
@@ -233,19 +544,21 @@ class Board(object):
         endangered groups for self will be updated in put_stone() after self groups are merged
         :param point:
         :param color:
-        :return:
+        :return: the (writable) self groups that had this liberty
         """
         # Check opponent's groups first
         opponent = opponent_color(color)
-        for group in self.libertydict.get_groups(opponent, point):
+        for group in list(self.libertydict.get_groups(opponent, point)):
             self._shorten_liberty(group, point, color)
-        self.libertydict.remove_point(opponent, point)  # update libertydict
+        self._remove_liberty_point(opponent, point)  # update libertydict
 
         # If any opponent's group dies, no need to check self group
+        self_groups = []
         if not self.winner:
-            for group in self.libertydict.get_groups(color, point):
-                self._shorten_liberty(group, point, color)
-        self.libertydict.remove_point(color, point)  # update libertydict
+            for group in list(self.libertydict.get_groups(color, point)):
+                self_groups.append(self._shorten_liberty(group, point, color))
+        self._remove_liberty_point(color, point)  # update libertydict
+        return self_groups
     
     def put_stone(self, point, check_legal=False):
         if check_legal:
@@ -256,14 +569,18 @@ class Board(object):
         if self.counter_move > 400:
             print(self)
             raise RuntimeError('More than 400 moves in one game! Board is printed.')
+        point = intern_point(point)
 
-        # Get all self-groups containing this liberty
-        self_belonging_groups = self.libertydict.get_groups(self.next, point).copy()
+        # Update position hash with the new stone and the side to move
+        self.zobrist_key ^= ZOBRIST_STONE[self.next][point] ^ ZOBRIST_WHITE_TO_MOVE
+        self.symmetry_keys = tuple(map(xor, self.symmetry_keys, self.geometry.symmetry_zobrist[self.next][point]))
 
         # Remove the liberty from all belonging groups (with consequences updated such as winner)
-        self.shorten_liberty_for_groups(point, self.next)
+        # Get all self-groups containing this liberty
+        self_belonging_groups = self.shorten_liberty_for_groups(point, self.next)
         self.counter_move += 1
         if self.winner:
+            self._update_dangerous_liberties()
             self.next = opponent_color(self.next)
             return True
 
@@ -276,9 +593,11 @@ class Board(object):
         # Update whether is endangered group
         # endangered groups for opponent are already updated in shorten_liberty_for_groups
         if new_group in self.endangered_groups and len(new_group.liberties) > 1:
-            self.endangered_groups.remove(new_group)
+            self._group_remove(self.endangered_groups, new_group)
         elif new_group not in self.endangered_groups and len(new_group.liberties) == 1:
-            self.endangered_groups.append(new_group)
+            self._group_set(self.endangered_groups, new_group)
+        self._update_dangerous_liberties()
+        self._update_enclosed(point)
 
         self.next = opponent_color(self.next)
 
@@ -294,6 +613,57 @@ class Board(object):
         board = self.copy()
         board.put_stone(action, check_legal=check_legal)
         return board
+
+    def play(self, action):
+        """
+        Apply the action in place, recording a compact delta so that undo() can revert it.
+        The delta keeps the previous scalars (winner, next, legal actions, etc.) and the inverse of every change
+        on groups, endangered groups, stonedict and libertydict, instead of copying the board.
+        :param action:
+        """
+        delta = []
+        self.undo_stack.append((self.winner, self.next, self.legal_actions, self.end_by_no_legal_actions,
+                                self.counter_move, self.zobrist_key, self.symmetry_keys, delta))
+        self._delta = delta
+        try:
+            self.put_stone(action, check_legal=False)
+        finally:
+            self._delta = None
+
+    def undo(self):
+        """Revert the last action applied by play()."""
+        winner, next_color, legal_actions, end_by_no_legal_actions, counter_move, zobrist_key, symmetry_keys, delta = \
+            self.undo_stack.pop()
+        for op in reversed(delta):
+            code = op[0]
+            if code == _POP:
+                op[1].pop()
+            elif code == _INSERT:
+                op[1].insert(op[2], op[3])
+            elif code == _SET_ADD:
+                op[1].add(op[2])
+            elif code == _TRUNCATE:
+                del op[1][op[2]:]
+            elif code == _SET_BUCKET:
+                if op[4] is None:
+                    op[1].remove_point(op[2], op[3])
+                else:
+                    op[1].set_groups(op[2], op[3], op[4])
+            elif code == _SET_LIBERTIES:
+                op[1].liberties = op[2]
+            elif code == _SET_ITEM:
+                op[1][op[2]] = op[3]
+            elif code == _SET_DISCARD:
+                op[1].discard(op[2])
+            elif code == _DEL_ITEM:
+                del op[1][op[2]]
+        self.winner = winner
+        self.next = next_color
+        self.legal_actions = legal_actions
+        self.end_by_no_legal_actions = end_by_no_legal_actions
+        self.counter_move = counter_move
+        self.zobrist_key = zobrist_key
+        self.symmetry_keys = symmetry_keys
         
     def __str__(self):
         str_groups = [str(group) for group in self.groups['BLACK']] + [str(group) for group in self.groups['WHITE']]
@@ -303,16 +673,114 @@ class Board(object):
         """To see if a stone has been placed on the board"""
         return len(self.stonedict.get_groups('BLACK', point)) > 0 or len(self.stonedict.get_groups('WHITE', point)) > 0
 
+    def to_compact(self):
+        """
+        Return a compact picklable form of the board:
+        (next, counter_move, winner, BLACK stones, WHITE stones, size).
+        """
+        black = tuple(point for point, groups in self.stonedict.get_items('BLACK') if groups)
+        white = tuple(point for point, groups in self.stonedict.get_items('WHITE') if groups)
+        return self.next, self.counter_move, self.winner, black, white, self.size
+
+    @classmethod
+    def from_compact(cls, compact):
+        """Rebuild a board from to_compact(); groups, liberties and legal actions are derived from the stones."""
+        next_color, counter_move, winner, black, white, size = compact
+        board = cls(next_color, size)
+        board.counter_move = counter_move
+        stones = {'BLACK': set(black), 'WHITE': set(white)}
+        for color in ('BLACK', 'WHITE'):
+            unvisited = set(stones[color])
+            for point in stones[color]:
+                if point not in unvisited:
+                    continue
+                # Flood fill the group of the point
+                unvisited.remove(point)
+                points, liberties, frontier = [], set(), [point]
+                while frontier:
+                    p = frontier.pop()
+                    points.append(p)
+                    board.zobrist_key ^= ZOBRIST_STONE[color][p]
+                    images = board.geometry.symmetry_zobrist[color][p]
+                    board.symmetry_keys = tuple(map(xor, board.symmetry_keys, images))
+                    for n in board.geometry.neighbors[p]:
+                        if n in unvisited:
+                            unvisited.remove(n)
+                            frontier.append(n)
+                        elif n not in stones['BLACK'] and n not in stones['WHITE']:
+                            liberties.add(n)
+                group = Group(points, color, liberties)
+                board._owned.add(id(group))
+                board.groups[color].d[group.gid] = group
+                if len(liberties) == 1:
+                    board.endangered_groups.d[group.gid] = group
+                bucket = [group]
+                for p in points:
+                    board.stonedict.set_groups(color, p, bucket)
+                for liberty in liberties:
+                    board.libertydict.d[color].setdefault(liberty, []).append(group)
+        board._compute_aggregates()
+        board.winner = winner
+        if not winner:
+            board.legal_actions = board._get_legal_actions()
+            if not board.legal_actions:
+                board.winner = opponent_color(next_color)
+                board.end_by_no_legal_actions = True
+        return board
+
     def copy(self):
-        """Manual copy because of group dependencies across self variables"""
-        board = Board(self.next)
+        """
+        Copy-on-write copy: both boards share groups and PointDict buckets, which are cloned on first mutation.
+        Only the dicts and group lists are copied, so the cost is proportional to the number of points and groups,
+        not to the number of stones and liberties.
+        """
+        if self.undo_stack:
+            # undo() reverts changes in place, which is not safe on objects shared with another board
+            return self._deepcopy()
+        board = Board(self.next, self.size)
         board.winner = self.winner
+        board.legal_actions = self.legal_actions  # Never mutated in place
+        board.end_by_no_legal_actions = self.end_by_no_legal_actions
+        board.counter_move = self.counter_move
+        board.zobrist_key = self.zobrist_key
+        board.symmetry_keys = self.symmetry_keys
+
+        board.groups = {'BLACK': self.groups['BLACK'].copy(), 'WHITE': self.groups['WHITE'].copy()}
+        board.endangered_groups = self.endangered_groups.copy()
+        board.removed_groups = self.removed_groups.copy()
+        board.libertydict = self.libertydict.copy()
+        board.stonedict = self.stonedict.copy()
+
+        board.num_groups_by_liberty = {'BLACK': self.num_groups_by_liberty['BLACK'].copy(),
+                                       'WHITE': self.num_groups_by_liberty['WHITE'].copy()}
+        board.liberty_sum = self.liberty_sum.copy()
+        board.liberty_points = {'BLACK': self.liberty_points['BLACK'].copy(),
+                                'WHITE': self.liberty_points['WHITE'].copy()}
+        board.dangerous_liberties = {'BLACK': self.dangerous_liberties['BLACK'].copy(),
+                                     'WHITE': self.dangerous_liberties['WHITE'].copy()}
+        board.enclosed = self.enclosed.copy()
+
+        # Nothing is owned exclusively by either board anymore
+        self._owned = set()
+        return board
 
-        group_mapping = {group: deepcopy(group) for group in self.groups['BLACK'] + self.groups['WHITE']}
-        board.groups['BLACK'] = [group_mapping[group] for group in self.groups['BLACK']]
-        board.groups['WHITE'] = [group_mapping[group] for group in self.groups['WHITE']]
-
-        board.endangered_groups = [group_mapping[group] for group in self.endangered_groups]
+    def _deepcopy(self):
+        """Manual copy because of group dependencies across self variables"""
+        board = Board(self.next, self.size)
+        board.winner = self.winner
+        board.legal_actions = self.legal_actions
+        board.end_by_no_legal_actions = self.end_by_no_legal_actions
+        board.counter_move = self.counter_move
+        board.zobrist_key = self.zobrist_key
+        board.symmetry_keys = self.symmetry_keys
+
+        group_mapping = {group: deepcopy(group) for color in ('BLACK', 'WHITE') for group in self.groups[color]}
+        for group in self.removed_groups:
+            group_mapping.setdefault(group, deepcopy(group))
+        board.groups['BLACK'] = GroupSet(group_mapping[group] for group in self.groups['BLACK'])
+        board.groups['WHITE'] = GroupSet(group_mapping[group] for group in self.groups['WHITE'])
+
+        board.endangered_groups = GroupSet(group_mapping[group] for group in self.endangered_groups)
         board.removed_groups = [group_mapping[group] for group in self.removed_groups]
 
         for point, groups in self.libertydict.get_items('BLACK'):
@@ -322,11 +790,15 @@ class Board(object):
             if groups:
                 board.libertydict.set_groups('WHITE', point, [group_mapping[group] for group in groups])
 
-        for point, groups in self.stonedict.get_items('BLACK'):
-            if groups:
-                board.stonedict.set_groups('BLACK', point, [group_mapping[group] for group in groups])
-        for point, groups in self.stonedict.get_items('WHITE'):
-            if groups:
-                board.stonedict.set_groups('WHITE', point, [group_mapping[group] for group in groups])
+        for color in ('BLACK', 'WHITE'):
+            for group in self.groups[color]:
+                board.stonedict.d[color].update(dict.fromkeys(group.points, [group_mapping[group]]))
+
+        board.num_groups_by_liberty = deepcopy(self.num_groups_by_liberty)
+        board.liberty_sum = self.liberty_sum.copy()
+        board.liberty_points = deepcopy(self.liberty_points)
+        board.dangerous_liberties = deepcopy(self.dangerous_liberties)
+        board.enclosed = self.enclosed.copy()
 
+        board._owned = {id(group) for group in group_mapping.values()}
         return board
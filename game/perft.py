@@ -0,0 +1,135 @@
+from game.go import Board
+from game.bitboard import BitBoard
+from argparse import ArgumentParser
+import random
+import time
+"""
+Perft: count the leaf nodes of the game tree to a fixed depth, to check that a rewrite of the rules engine
+generates exactly the same moves, and to benchmark move generation (leaves per second).
+"""
+
+# Reference counts of start_position(seed, num_moves): {(seed, num_moves, depth): (nodes, capture, no legal actions)}
+REFERENCE_COUNTS = {
+    (0, 0, 1): (4, 0, 0),
+    (0, 0, 2): (12, 0, 0),
+    (0, 0, 3): (64, 0, 0),
+    (0, 0, 4): (280, 0, 0),
+    (6, 8, 1): (11, 0, 0),
+    (6, 8, 2): (42, 0, 0),
+    (6, 8, 3): (227, 2, 1),
+    (6, 8, 4): (1002, 9, 1),
+    (6, 12, 1): (11, 0, 0),
+    (6, 12, 2): (74, 0, 0),
+    (6, 12, 3): (459, 5, 4),
+    (6, 12, 4): (3162, 42, 4),
+    (3, 16, 1): (13, 0, 0),
+    (3, 16, 2): (75, 3, 0),
+    (3, 16, 3): (860, 3, 0),
+    (3, 16, 4): (5646, 181, 0),
+    (3, 24, 1): (17, 0, 0),
+    (3, 24, 2): (153, 2, 0),
+    (3, 24, 3): (2368, 3, 0),
+    (3, 30, 1): (18, 0, 0),
+    (3, 30, 2): (138, 2, 0),
+    (3, 30, 3): (1556, 3, 0),
+}
+
+
+class PerftResult:
+    """Leaf counts by kind: positions at the full depth, and earlier terminal positions by how the game ended."""
+    def __init__(self, nodes=0, capture=0, no_legal_actions=0):
+        self.nodes = nodes  # Non-terminal positions at the full depth
+        self.capture = capture  # Games won by removing a group
+        self.no_legal_actions = no_legal_actions  # Games won as the opponent has no legal actions
+
+    @property
+    def leaves(self):
+        return self.nodes + self.capture + self.no_legal_actions
+
+    def to_tuple(self):
+        return self.nodes, self.capture, self.no_legal_actions
+
+    def __str__(self):
+        return 'leaves: %d (nodes: %d; capture: %d; no legal actions: %d)' % (
+            self.leaves, self.nodes, self.capture, self.no_legal_actions)
+
+
+def perft(board, depth, result=None):
+    """
+    Count the leaves reachable from the board in up to `depth` moves, through get_legal_actions() and play()/undo().
+    The board is restored on return.
+    :param board: Board or BitBoard
+    :param result: PerftResult to add the counts to; a new one if None
+    :return: PerftResult
+    """
+    if result is None:
+        result = PerftResult()
+    if board.winner is not None:
+        if board.end_by_no_legal_actions:
+            result.no_legal_actions += 1
+        else:
+            result.capture += 1
+        return result
+    if depth == 0:
+        result.nodes += 1
+        return result
+
+    for action in board.get_legal_actions():
+        board.play(action)
+        perft(board, depth - 1, result)
+        board.undo()
+    return result
+
+
+def start_position(seed, num_moves, board_cls=Board):
+    """The first move on the center, then num_moves seeded random legal moves (fewer if the game ends)."""
+    rng = random.Random(seed)
+    board = board_cls(next_color='BLACK')
+    board.put_stone(board.center, check_legal=False)
+    for _ in range(num_moves):
+        if board.winner is not None:
+            break
+        board.put_stone(rng.choice(sorted(board.get_legal_actions())), check_legal=False)
+    return board
+
+
+def check_reference(board_cls=Board, max_depth=None, verbose=True):
+    """
+    Run perft on all reference positions (up to max_depth if given); return the list of mismatches.
+    :return: list of ((seed, num_moves, depth), expected counts, counts)
+    """
+    mismatches = []
+    for (seed, num_moves, depth), expected in sorted(REFERENCE_COUNTS.items()):
+        if max_depth is not None and depth > max_depth:
+            continue
+        board = start_position(seed, num_moves, board_cls)
+        start_time = time.time()
+        result = perft(board, depth)
+        time_elapsed = time.time() - start_time
+        if result.to_tuple() != expected:
+            mismatches.append(((seed, num_moves, depth), expected, result.to_tuple()))
+        if verbose:
+            print('seed %d, %d moves, depth %d: %s; %.0f leaves/s%s' % (
+                seed, num_moves, depth, result, result.leaves / max(time_elapsed, 1e-9),
+                '' if result.to_tuple() == expected else '  MISMATCH, expected %s' % (expected,)))
+    return mismatches
+
+
+def main():
+    parser = ArgumentParser('Mini Go Game Perft')
+    parser.add_argument('-e', '--engine', default='board',
+                        help='possible engines: board; bitboard; DEFAULT is board')
+    parser.add_argument('-d', '--max_depth', type=int, default=None,
+                        help='if not None, skip reference positions deeper than this; DEFAULT is None')
+    args = parser.parse_args()
+
+    board_cls = {'board': Board, 'bitboard': BitBoard}[args.engine.lower()]
+    start_time = time.time()
+    mismatches = check_reference(board_cls, args.max_depth)
+    print('%d mismatches; %.2f seconds' % (len(mismatches), time.time() - start_time))
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
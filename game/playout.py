@@ -0,0 +1,118 @@
+from game.bitboard import BitBoard, iter_bits
+import random
+"""
+Lightweight random playouts: play a game to the end with uniformly random legal moves, as cheaply as possible.
+"""
+
+COLORS = ('BLACK', 'WHITE')
+
+
+def playout(board, rng=random):
+    """
+    Play the game from the board to the end with uniformly random legal moves; the board is not modified.
+    Same rules as game.go.Board, but with only the state needed to pick moves and decide the winner:
+    no legal actions list (a random candidate is drawn and only that one is checked for suicide),
+    no views, no hash, no undo; and the game is decided as soon as the player to move can capture.
+    :param board: BitBoard, or Board (converted to a BitBoard on each call; callers running many playouts should
+                  convert once and pass the BitBoard)
+    :param rng: random number generator, such as random.Random(seed)
+    :return: winner, and number of moves played in the playout
+    """
+    if board.winner:
+        return board.winner, 0
+    for group in board.endangered_groups:
+        if group.color != board.next:
+            return board.next, 1  # Capture right away
+    b = board.copy() if isinstance(board, BitBoard) else BitBoard.from_compact(board.to_compact())
+
+    # Colors are 0 (BLACK) and 1 (WHITE) in the playout
+    stones = [b.stones['BLACK'], b.stones['WHITE']]
+    group_of = b.group_of
+    liberties = b.group_liberties
+    group_stones = b.group_stones
+    groups = [set(b.group_ids['BLACK']), set(b.group_ids['WHITE'])]
+    atari = [set(), set()]  # Groups with only one liberty
+    for gid in b.endangered_ids:
+        atari[COLORS.index(b.group_color[gid])].add(gid)
+    next_gid = b.next_gid
+    neighbors, neighbor_mask = b.neighbors, b.neighbor_mask
+
+    mover = COLORS.index(b.next)
+    num_moves = 0
+    while True:
+        oppo = 1 - mover
+        # Any opponent's group in atari: all legal actions capture it
+        if atari[oppo]:
+            return COLORS[mover], num_moves + 1
+
+        candidates = 0
+        for gid in (atari[mover] if atari[mover] else groups[oppo]):
+            candidates |= liberties[gid]
+        candidates = list(iter_bits(candidates))
+
+        # Draw candidates until one is not suicidal
+        occupied = stones[0] | stones[1]
+        self_stones = stones[mover]
+        while candidates:
+            k = rng.randrange(len(candidates))
+            idx = candidates[k]
+            if neighbor_mask[idx] & ~occupied:
+                break
+            legal = False
+            for n in neighbors[idx]:
+                if self_stones >> n & 1:
+                    libs = liberties[group_of[n]]
+                    if libs & (libs - 1):
+                        legal = True
+                        break
+            if legal:
+                break
+            candidates[k] = candidates[-1]
+            candidates.pop()
+        else:
+            return COLORS[oppo], num_moves  # No legal actions for the player to move
+
+        # Put the stone; it can't capture, as no opponent's group is in atari
+        bit = 1 << idx
+        oppo_stones = stones[oppo]
+        self_gids = []
+        for n in neighbors[idx]:
+            if oppo_stones >> n & 1:
+                gid = group_of[n]
+                libs = liberties[gid] & ~bit
+                liberties[gid] = libs
+                if not libs & (libs - 1):
+                    atari[oppo].add(gid)
+            elif self_stones >> n & 1:
+                gid = group_of[n]
+                if gid not in self_gids:
+                    self_gids.append(gid)
+        stones[mover] = self_stones | bit
+        libs = neighbor_mask[idx] & ~(occupied | bit)
+        if self_gids:
+            gid = self_gids[0]
+            merged = group_stones[gid] | bit
+            libs |= liberties[gid]
+            for other in self_gids[1:]:
+                for s in iter_bits(group_stones[other]):
+                    group_of[s] = gid
+                merged |= group_stones.pop(other)
+                libs |= liberties.pop(other)
+                groups[mover].discard(other)
+                atari[mover].discard(other)
+            libs &= ~bit
+        else:
+            gid = next_gid
+            next_gid += 1
+            merged = bit
+            groups[mover].add(gid)
+        group_of[idx] = gid
+        group_stones[gid] = merged
+        liberties[gid] = libs
+        if not libs & (libs - 1):
+            atari[mover].add(gid)
+        else:
+            atari[mover].discard(gid)
+
+        num_moves += 1
+        mover = oppo
@@ -0,0 +1,79 @@
+from game.go import SYMMETRIES, SYMMETRY_INVERSE, get_geometry, zobrist_next
+"""
+Canonical orientation of positions under the 8 symmetries of the board (rotations and reflections).
+Every game starts from the center, so early positions repeat in up to 8 orientations; keying caches, opening books
+and training data by canonical_key() lets all orientations of a position share one entry.
+Symmetry k maps a point p to transform_point(p, k, size); canonical_symmetry() is the k that maps the board to
+its canonical orientation, and actions are mapped back with SYMMETRY_INVERSE[k].
+"""
+
+NUM_SYMMETRIES = len(SYMMETRIES)
+
+
+def transform_point(point, k, size=19):
+    """Image of the point by symmetry k on a board with size rows/cols."""
+    return get_geometry(size).symmetries[k][point]
+
+
+def canonical_symmetry(board):
+    """
+    The symmetry that maps the board to its canonical orientation: the image with the lowest stone hash
+    (the lowest k on ties, i.e. symmetric positions).
+    :param board: Board or BitBoard
+    """
+    keys = board.symmetry_keys
+    return keys.index(min(keys))
+
+
+def canonical_key(board):
+    """Hash of the canonical orientation of the board (stones and the side to move); same for all 8 orientations."""
+    return min(board.symmetry_keys) ^ zobrist_next(board.next)
+
+
+def to_canonical(board, action, k=None):
+    """
+    Map an action on the board to the canonical orientation.
+    :param k: canonical_symmetry(board), if already known
+    """
+    if k is None:
+        k = canonical_symmetry(board)
+    return board.geometry.symmetries[k][action]
+
+
+def from_canonical(board, action, k=None):
+    """
+    Map an action in the canonical orientation back to the board.
+    :param k: canonical_symmetry(board), if already known
+    """
+    if k is None:
+        k = canonical_symmetry(board)
+    return board.geometry.symmetries[SYMMETRY_INVERSE[k]][action]
+
+
+def transform_board(board, k):
+    """Return a new board (same class) that is the image of the board by symmetry k."""
+    images = board.geometry.symmetries[k]
+    next_color, counter_move, winner, black, white, size = board.to_compact()
+    compact = (next_color, counter_move, winner, tuple(images[p] for p in black), tuple(images[p] for p in white), size)
+    return type(board).from_compact(compact)
+
+
+def canonicalize(board):
+    """
+    Return the board in its canonical orientation, and the symmetry k that maps the board to it
+    (map actions back with from_canonical(board, action, k)).
+    """
+    k = canonical_symmetry(board)
+    return (board.copy() if k == 0 else transform_board(board, k)), k
+
+
+def dedupe(boards):
+    """Keep the first board of every canonical position, e.g. to deduplicate training positions."""
+    seen = set()
+    unique = []
+    for board in boards:
+        key = canonical_key(board)
+        if key not in seen:
+            seen.add(key)
+            unique.append(board)
+    return unique
@@ -4,8 +4,8 @@ This file is the GUI on top of the game backend.
 """
 
 BACKGROUND = 'game/images/ramin.jpg'
-BOARD_SIZE = (820, 820)
 BLACK = (0, 0, 0)
+STAR_POINTS = {9: (3, 5, 7), 13: (4, 7, 10), 19: (4, 10, 16)}  # Rows/cols of star points per board size
 
 
 def get_rbg(color):
@@ -27,9 +27,13 @@ def leftup_corner(point):
 
 
 class UI:
-    def __init__(self):
-        """Create, initialize and draw an empty board."""
-        self.outline = pygame.Rect(45, 45, 720, 720)
+    def __init__(self, size=19):
+        """
+        Create, initialize and draw an empty board.
+        :param size: number of rows/cols of the board
+        """
+        self.size = size
+        self.outline = pygame.Rect(45, 45, 40 * (size - 1), 40 * (size - 1))
         self.screen = None
         self.background = None
 
@@ -38,20 +42,20 @@ class UI:
         # This method is from https://github.com/eagleflo/goban/blob/master/goban.py
         pygame.init()
         pygame.display.set_caption('Goban')
-        self.screen = pygame.display.set_mode(BOARD_SIZE, 0, 32)
+        window = 40 * (self.size - 1) + 100
+        self.screen = pygame.display.set_mode((window, window), 0, 32)
         self.background = pygame.image.load(BACKGROUND).convert()
 
         pygame.draw.rect(self.background, BLACK, self.outline, 3)
         # Outline is inflated here for future use as a collidebox for the mouse
         self.outline.inflate_ip(20, 20)
-        for i in range(18):
-            for j in range(18):
+        for i in range(self.size - 1):
+            for j in range(self.size - 1):
                 rect = pygame.Rect(45 + (40 * i), 45 + (40 * j), 40, 40)
                 pygame.draw.rect(self.background, BLACK, rect, 1)
-        for i in range(3):
-            for j in range(3):
-                coords = (165 + (240 * i), 165 + (240 * j))
-                pygame.draw.circle(self.background, BLACK, coords, 5, 0)
+        for x in STAR_POINTS[self.size]:
+            for y in STAR_POINTS[self.size]:
+                pygame.draw.circle(self.background, BLACK, coords((x, y)), 5, 0)
         self.screen.blit(self.background, (0, 0))
         pygame.display.update()
 
@@ -3,9 +3,8 @@ class PointDict:
         self.d = {'BLACK': {}, 'WHITE': {}}
 
     def get_groups(self, color, point):
-        if point not in self.d[color]:
-            self.d[color][point] = []
-        return self.d[color][point]
+        """Read-only lookup; an empty tuple if the point has no groups (nothing is allocated on a miss)."""
+        return self.d[color].get(point, ())
 
     def set_groups(self, color, point, groups):
         self.d[color][point] = groups
@@ -16,3 +15,35 @@ class PointDict:
 
     def get_items(self, color):
         return self.d[color].items()
+
+    def copy(self):
+        """Shallow copy; the buckets are shared."""
+        pointdict = PointDict()
+        pointdict.d = {'BLACK': self.d['BLACK'].copy(), 'WHITE': self.d['WHITE'].copy()}
+        return pointdict
+
+
+class GroupSet:
+    """
+    Groups indexed by their id (Group.gid), for O(1) membership, removal and replacement of a group.
+    Iterates over the groups in insertion order; a clone of a group (same gid) replaces it in place.
+    """
+    def __init__(self, groups=()):
+        self.d = {group.gid: group for group in groups}
+
+    def __iter__(self):
+        return iter(self.d.values())
+
+    def __len__(self):
+        return len(self.d)
+
+    def __contains__(self, group):
+        return self.d.get(group.gid) is group
+
+    def get(self, gid):
+        return self.d.get(gid)
+
+    def copy(self):
+        groupset = GroupSet()
+        groupset.d = self.d.copy()
+        return groupset
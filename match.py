@@ -1,36 +1,44 @@
 #!/usr/bin/env python
 from game.go import Board, opponent_color
+from game.bitboard import BitBoard
 from game.ui import UI
 import pygame
 import time
 from agent.basic_agent import RandomAgent, GreedyAgent
 from agent.search.search_agent import AlphaBetaAgent, ExpectimaxAgent
+from agent.mcts.mcts_agent import MCTSAgent
 from agent.rl.rl_agent import ApproxQAgent
 from agent.rl.rl_env import RlEnv
+from agent.search.stats import aggregate
 from os.path import join
 from argparse import ArgumentParser
+import json
 
 
 class Match:
-    def __init__(self, agent_black=None, agent_white=None, gui=True, dir_save=None):
+    def __init__(self, agent_black=None, agent_white=None, gui=True, dir_save=None, board_cls=Board, board_size=19):
         """
         BLACK always has the first move on the center of the board.
         :param agent_black: agent or None(human)
         :param agent_white: agent or None(human)
         :param gui: if show GUI; always true if there are human playing
         :param dir_save: directory to save board image if GUI is shown; no save for None
+        :param board_cls: the game engine, Board or BitBoard
+        :param board_size: number of rows/cols of the board, one of game.go.BOARD_SIZES
         """
         self.agent_black = agent_black
         self.agent_white = agent_white
 
-        self.board = Board(next_color='BLACK')
+        self.board = board_cls(next_color='BLACK', size=board_size)
 
         gui = gui if agent_black and agent_white else True
-        self.ui = UI() if gui else None
+        self.ui = UI(board_size) if gui else None
         self.dir_save = dir_save
 
         # Metadata
         self.time_elapsed = None
+        self.move_latencies = {'BLACK': [], 'WHITE': []}  # Seconds taken by the agent of each color per move
+        self.search_stats = {'BLACK': [], 'WHITE': []}  # Stats dicts of search agents per move (see SearchStats)
 
     @property
     def winner(self):
@@ -56,7 +64,7 @@ class Match:
         self.time_elapsed = time.time()
 
         # First move is fixed on the center of board
-        first_move = (10, 10)
+        first_move = self.board.center
         self.board.put_stone(first_move, check_legal=False)
         self.ui.draw(first_move, opponent_color(self.board.next))
 
@@ -72,7 +80,7 @@ class Match:
                 continue
 
             # Apply action
-            prev_legal_actions = self.board.legal_actions.copy()
+            prev_legal_actions = self.board.legal_actions  # Read-only tuple, replaced by put_stone()
             self.board.put_stone(point, check_legal=False)
             # Remove previous legal actions on board
             for action in prev_legal_actions:
@@ -100,7 +108,7 @@ class Match:
         """Start the game without GUI. Only possible when no human is playing."""
         # First move is fixed on the center of board
         self.time_elapsed = time.time()
-        first_move = (10, 10)
+        first_move = self.board.center
         self.board.put_stone(first_move, check_legal=False)
 
         # Take turns to play move
@@ -128,7 +136,15 @@ class Match:
         if self.ui:
             pygame.time.wait(100)
             pygame.event.get()
-        return agent.get_action(self.board)
+        start_time = time.time()
+        action = agent.get_action(self.board)
+        self.move_latencies[self.board.next].append(time.time() - start_time)
+        stats = getattr(agent, 'stats', None)
+        if stats is not None:
+            stats = stats.to_dict()
+            stats['move'] = self.board.counter_move
+            self.search_stats[self.board.next].append(stats)
+        return action
 
     def _move_by_human(self):
         while True:
@@ -150,19 +166,48 @@ class Match:
 def get_args():
     parser = ArgumentParser('Mini Go Game')
     parser.add_argument('-b', '--agent_black', default=None,
-                        help='possible agents: random; greedy; minimax; expectimax, approx-q; DEFAULT is None (human)')
+                        help='possible agents: random; greedy; minimax; expectimax, mcts, approx-q; '
+                             'DEFAULT is None (human)')
     parser.add_argument('-w', '--agent_white', default=None,
-                        help='possible agents: random; greedy; minimax; expectimax, approx-q; DEFAULT is None (human)')
+                        help='possible agents: random; greedy; minimax; expectimax, mcts, approx-q; '
+                             'DEFAULT is None (human)')
     parser.add_argument('-d', '--search_depth', type=int, default=1,
                         help='the search depth for searching agents if applicable; DEFAULT is 1')
+    parser.add_argument('-t', '--move_time', type=float, default=None,
+                        help='if not None, time budget in seconds per move for searching agents, which then search '
+                             'iteratively deeper instead of the fixed depth, and for mcts instead of the fixed number '
+                             'of playouts; DEFAULT is None')
+    parser.add_argument('-p', '--num_workers', type=int, default=None,
+                        help='if not None, number of processes for searching agents to search root actions in '
+                             'parallel; DEFAULT is None')
     parser.add_argument('-g', '--gui', type=bool, default=True,
                         help='if show GUI; always true if human plays; DEFAULT is True')
     parser.add_argument('-s', '--dir_save', default=None,
                         help='if not None, save the image of last board state to this directory; DEFAULT is None')
+    parser.add_argument('-e', '--engine', default='board',
+                        help='possible engines: board; bitboard; DEFAULT is board')
+    parser.add_argument('-z', '--board_size', type=int, default=19,
+                        help='number of rows/cols of the board: 9; 13; 19; DEFAULT is 19')
+    parser.add_argument('--solver_nodes', type=int, default=None,
+                        help='if not None, node budget of the proof-number solver that searching agents try before '
+                             'searching, to play a proven forced win directly; DEFAULT is None')
+    parser.add_argument('--stats', default=None,
+                        help='if not None, write the stats of every search move to this file as JSON lines; '
+                             'DEFAULT is None')
     return parser.parse_args()
 
 
-def get_agent(str_agent, color, depth):
+def get_board_cls(str_engine):
+    str_engine = str_engine.lower()
+    if str_engine == 'board':
+        return Board
+    elif str_engine == 'bitboard':
+        return BitBoard
+    else:
+        raise ValueError('Invalid engine: ' + str_engine)
+
+
+def get_agent(str_agent, color, depth, move_time=None, num_workers=None, solver_nodes=None):
     if str_agent is None:
         return None
     str_agent = str_agent.lower()
@@ -173,9 +218,13 @@ def get_agent(str_agent, color, depth):
     elif str_agent == 'greedy':
         return GreedyAgent(color)
     elif str_agent == 'minimax':
-        return AlphaBetaAgent(color, depth=depth)
+        return AlphaBetaAgent(color, depth=depth, move_time=move_time, num_workers=num_workers,
+                              solver_nodes=solver_nodes)
     elif str_agent == 'expectimax':
-        return ExpectimaxAgent(color, depth=depth)
+        return ExpectimaxAgent(color, depth=depth, move_time=move_time, num_workers=num_workers,
+                               solver_nodes=solver_nodes)
+    elif str_agent == 'mcts':
+        return MCTSAgent(color, move_time=move_time)
     elif str_agent == 'approx-q':
         agent = ApproxQAgent(color, RlEnv())
         agent.load('agent/rl/ApproxQAgent.npy')
@@ -187,17 +236,19 @@ def get_agent(str_agent, color, depth):
 def main():
     args = get_args()
     depth = args.search_depth
-    agent_black = get_agent(args.agent_black, 'BLACK', depth)
-    agent_white = get_agent(args.agent_white, 'WHITE', depth)
+    agent_black = get_agent(args.agent_black, 'BLACK', depth, args.move_time, args.num_workers, args.solver_nodes)
+    agent_white = get_agent(args.agent_white, 'WHITE', depth, args.move_time, args.num_workers, args.solver_nodes)
     gui = args.gui
     dir_save = args.dir_save
+    board_cls = get_board_cls(args.engine)
 
     print('Agent for BLACK: ' + (str(agent_black) if agent_black else 'Human'))
     print('Agent for WHITE: ' + (str(agent_white) if agent_white else 'Human'))
     if dir_save:
         print('Directory to save board image: ' + dir_save)
 
-    match = Match(agent_black=agent_black, agent_white=agent_white, gui=gui, dir_save=dir_save)
+    match = Match(agent_black=agent_black, agent_white=agent_white, gui=gui, dir_save=dir_save, board_cls=board_cls,
+                  board_size=args.board_size)
 
     print('Match starts!')
     match.start()
@@ -206,6 +257,20 @@ def main():
     print('Match ends in ' + str(match.time_elapsed) + ' seconds')
     print('Match ends in ' + str(match.counter_move) + ' moves')
 
+    for color in ('BLACK', 'WHITE'):
+        if match.search_stats[color]:
+            summary = aggregate(match.search_stats[color])
+            print('Search of %s: %d nodes per move; %.0f nodes/s; depth %s; eval %.0f%%, move %.0f%%, ordering %.0f%% '
+                  'of time' % (color, summary['nodes_mean'], summary['nps'], summary['depth_mean'],
+                               summary['eval_time_share'] * 100, summary['move_time_share'] * 100,
+                               summary['ordering_time_share'] * 100))
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            for color in ('BLACK', 'WHITE'):
+                for stats in match.search_stats[color]:
+                    f.write(json.dumps(dict(stats, color=color)) + '\n')
+        print('Search stats saved in file ' + args.stats)
+
 
 if __name__ == '__main__':
     # match = Match()